@@ -1,10 +1,7 @@
 import sys
-import time
-import threading
 from pathlib import Path
 
 import pandas as pd
-import requests
 import streamlit as st
 
 ROOT_DIR = Path(__file__).resolve().parents[1]
@@ -12,139 +9,40 @@ SRC_DIR = ROOT_DIR / "src"
 if str(SRC_DIR) not in sys.path:
     sys.path.insert(0, str(SRC_DIR))
 
+from tma.async_http_api import fetch_many_blocking
+from tma.book_cache import TieredCache, shared_book_cache
+from tma.config import DEEP_BOOK_MAX_PAGES, MAX_WORKERS, RATE_LIMIT_PER_MIN, USE_ASYNC_CLIENT
+from tma.history_store import HistoryStore
+from tma.http_api import deepen_books, fetch_many, session_for_requests
+from tma.incremental import IncrementalPricer
 from tma.inventory_matcher import match_inventory
-from tma.market_enrichment import wide_to_long, enrich_all_items, build_summary_from_enriched
-
-BASE_URL = "https://api.torn.com/v2"
-MAX_WORKERS = 5
-RATE_LIMIT_PER_MIN = 90
-RETRIES = 3
-TIMEOUT = 15
+from tma.order_book import book_is_thin
+from tma.rate_limit import TokenBucket
+from tma.snapshot_cache import SnapshotCache
+from tma.market_enrichment import books_to_wide
 
 DICT_PATH = (ROOT_DIR / "data" / "torn_item_dictionary.csv").resolve()
+SNAPSHOT_DB_PATH = (ROOT_DIR / "data" / "market_snapshots.sqlite").resolve()
+HISTORY_DIR = (ROOT_DIR / "data" / "history").resolve()
 
 
-class TokenBucket:
-    def __init__(self, rate_per_min: int, capacity: int | None = None) -> None:
-        self.rate_per_sec = rate_per_min / 60.0
-        self.capacity = capacity or rate_per_min
-        self.tokens = float(self.capacity)
-        self.last = time.perf_counter()
-        self.lock = threading.Lock()
-
-    def take(self, tokens: int = 1) -> None:
-        while True:
-            with self.lock:
-                now = time.perf_counter()
-                self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate_per_sec)
-                self.last = now
-                if self.tokens >= tokens:
-                    self.tokens -= tokens
-                    return
-            time.sleep(0.01)
-
-
-def session_for_requests() -> requests.Session:
-    session = requests.Session()
-    adapter = requests.adapters.HTTPAdapter(
-        pool_connections=MAX_WORKERS * 10,
-        pool_maxsize=MAX_WORKERS * 10,
-    )
-    session.mount("https://", adapter)
-    session.headers.update(
-        {
-            "accept": "application/json",
-            "User-Agent": "torn-itemmarket-web/1.1",
-        }
-    )
-    return session
-
-
-def attempt_call(
-    session: requests.Session,
-    bucket: TokenBucket,
-    api_key: str,
-    item_id: int,
-    mode: int,
-) -> tuple[int | None, dict]:
-    url = f"{BASE_URL}/market/{item_id}/itemmarket"
-    headers: dict[str, str] = {}
-    params: dict[str, int | str] = {"limit": 100, "offset": 0}
-
-    if mode == 1:
-        headers["Authorization"] = f"Apikey {api_key}"
-    elif mode == 2:
-        headers["Authorization"] = f"ApiKey {api_key}"
-    else:
-        params["key"] = api_key
-
-    bucket.take(1)
-    resp = session.get(url, headers=headers, params=params, timeout=TIMEOUT)
-    return resp.status_code, resp.json()
-
-
-def fetch_100(
-    session: requests.Session,
-    bucket: TokenBucket,
-    api_key: str,
-    item_id: int,
-    my_quantity: int,
-) -> dict:
-    backoff = 0.8
-
-    for _ in range(1, RETRIES + 1):
-        for mode in (1, 2, 3):
-            try:
-                status, data = attempt_call(session, bucket, api_key, item_id, mode)
-            except Exception as exc:
-                status, data = None, {"error": {"code": -1, "error": str(exc)}}
-
-            if isinstance(data, dict) and "error" in data:
-                code = data["error"].get("code")
-                msg = data["error"].get("error")
-
-                if code == 2 and mode != 3:
-                    continue
-
-                if code in (0, 10) or status in (429, 500, 502, 503, 504):
-                    time.sleep(backoff)
-                    backoff *= 1.6
-                    break
-
-                return {
-                    "item_id": item_id,
-                    "my_quantity": my_quantity,
-                    "error": f"API error {code}: {msg}",
-                }
-
-            itemmarket = (data or {}).get("itemmarket", {}) or {}
-            item = itemmarket.get("item", {}) or {}
-            listings = itemmarket.get("listings", []) or []
-
-            n = min(len(listings), 100)
-
-            row: dict[str, object] = {
-                "item_id": item.get("id", item_id),
-                "item_name": item.get("name"),
-                "item_type": item.get("type"),
-                "average_price": item.get("average_price"),
-                "my_quantity": my_quantity,
-            }
-
-            for i, listing in enumerate(listings[:n], start=1):
-                row[f"price_{i}"] = listing.get("price")
-                row[f"amount_{i}"] = listing.get("amount")
-
-            for i in range(n + 1, 101):
-                row[f"price_{i}"] = None
-                row[f"amount_{i}"] = None
-
-            return row
-
-        time.sleep(backoff)
-        backoff *= 1.6
-
-    return {"item_id": item_id, "my_quantity": my_quantity, "error": "Exhausted retries"}
+@st.cache_resource
+def market_cache() -> TieredCache:
+    # One instance per server process, shared by every session: hot items are
+    # served from memory first, then from the on-disk snapshots.
+    return TieredCache([shared_book_cache(), SnapshotCache(SNAPSHOT_DB_PATH)])
+
+
+@st.cache_resource
+def market_pricer() -> IncrementalPricer:
+    # Remembers enriched rows and summaries per book, so a refresh only
+    # re-prices the items whose listings actually moved.
+    return IncrementalPricer()
+
+
+@st.cache_resource
+def market_history() -> HistoryStore:
+    return HistoryStore(HISTORY_DIR)
 
 
 def fmt_int(x) -> str:
@@ -216,6 +114,8 @@ with st.form("input_form", clear_on_submit=False):
         key="api_key_input",
     )
 
+    force_refresh = st.checkbox("Force refresh (ignore cached market snapshots)", value=False)
+
     submitted = st.form_submit_button("Run")
 
 if submitted:
@@ -250,32 +150,39 @@ if submitted:
             st.stop()
 
     with st.spinner("Fetching market data…"):
+        cache = market_cache()
         sess = session_for_requests()
         bucket = TokenBucket(RATE_LIMIT_PER_MIN)
+        if USE_ASYNC_CLIENT:
+            rows = fetch_many_blocking(
+                api_key,
+                agg,
+                rate_per_min=RATE_LIMIT_PER_MIN,
+                cache=cache,
+                force_refresh=force_refresh,
+            )
+        else:
+            rows = fetch_many(
+                sess,
+                bucket,
+                api_key,
+                agg,
+                max_workers=MAX_WORKERS,
+                cache=cache,
+                force_refresh=force_refresh,
+            )
 
-        rows = [fetch_100(sess, bucket, api_key, iid, qty) for iid, qty in agg]
-        df_market = pd.DataFrame(rows)
-
-        for i in range(1, 101):
-            pcol = f"price_{i}"
-            acol = f"amount_{i}"
-            if pcol in df_market.columns:
-                df_market[pcol] = pd.to_numeric(df_market[pcol], errors="coerce")
-            if acol in df_market.columns:
-                df_market[acol] = pd.to_numeric(df_market[acol], errors="coerce")
-
-        for c in ("average_price", "my_quantity", "item_id"):
-            if c in df_market.columns:
-                df_market[c] = pd.to_numeric(df_market[c], errors="coerce")
+        rows = deepen_books(sess, bucket, api_key, rows, book_is_thin, max_pages=DEEP_BOOK_MAX_PAGES, cache=cache)
+        fetch_errors = [r for r in rows if "error" in r]
 
     with st.spinner("Computing price suggestions…"):
-        df_long = wide_to_long(df_market)
-        if df_long.empty:
+        df_enriched, df_summary = market_pricer().price(rows)
+        if df_enriched.empty:
             st.warning("No valid listings found in the market data.")
             st.stop()
 
-        df_enriched = enrich_all_items(df_long)
-        df_summary = build_summary_from_enriched(df_enriched).sort_values("item_name").reset_index(drop=True)
+        market_history().append(rows, df_summary)
+        df_summary = df_summary.sort_values("item_name").reset_index(drop=True)
 
     st.subheader("Price overview")
 
@@ -300,6 +207,12 @@ if submitted:
     with st.expander("Parsed items"):
         st.dataframe(df_parsed, width="stretch", hide_index=True)
 
+    if result.fuzzy:
+        with st.expander(f"Fuzzy matches ({len(result.fuzzy)})"):
+            df_fuzzy = pd.DataFrame(result.fuzzy, columns=["text", "matched item", "score"])
+            df_fuzzy["score"] = df_fuzzy["score"].round(1)
+            st.dataframe(df_fuzzy, width="stretch", hide_index=True)
+
     if result.unmatched:
         with st.expander(f"Unmatched items ({len(result.unmatched)})"):
             df_unmatched = (
@@ -309,8 +222,19 @@ if submitted:
             )
             st.dataframe(df_unmatched, width="stretch", hide_index=True)
 
+    if fetch_errors:
+        names_by_id = {it.item_id: it.name for it in result.matched}
+        with st.expander(f"Fetch errors ({len(fetch_errors)})"):
+            df_errors = pd.DataFrame(
+                [
+                    {"name": names_by_id.get(r["item_id"]), "id": r["item_id"], "error": r["error"]}
+                    for r in fetch_errors
+                ]
+            )
+            st.dataframe(df_errors, width="stretch", hide_index=True)
+
     with st.expander("Raw market data"):
-        st.dataframe(df_market, width="stretch", hide_index=True)
+        st.dataframe(books_to_wide(rows), width="stretch", hide_index=True)
 
     with st.expander("Detailed pricing diagnostics"):
         st.dataframe(df_summary, width="stretch", hide_index=True)
@@ -0,0 +1,88 @@
+"""Peak RSS of a full-market enrichment run: staged per-item pipeline vs. array engine.
+
+Each mode runs in a fresh interpreter so the peaks don't contaminate each other.
+Run from the repository root (Unix only, uses the resource module):
+
+    python benchmarks/bench_enrichment_memory.py --items 1480
+"""
+
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+SRC_DIR = ROOT_DIR / "src"
+if str(SRC_DIR) not in sys.path:
+    sys.path.insert(0, str(SRC_DIR))
+
+from bench_wide_to_long import synthetic_wide
+from tma.market_enrichment import enrich_all_items, enrich_item_orders_staged, wide_to_long
+
+MODES = ("staged", "engine")
+
+
+def peak_rss_mib() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux and bytes on macOS.
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_child(mode: str, n_items: int) -> None:
+    long_df = wide_to_long(synthetic_wide(n_items))
+    before = peak_rss_mib()
+
+    start = time.perf_counter()
+    if mode == "staged":
+        parts = [enrich_item_orders_staged(g) for _, g in long_df.groupby("item_id")]
+        enriched = pd.concat(parts, ignore_index=True)
+    else:
+        enriched = enrich_all_items(long_df)
+    elapsed = time.perf_counter() - start
+
+    print(
+        json.dumps(
+            {
+                "mode": mode,
+                "rows": len(enriched),
+                "seconds": elapsed,
+                "peak_before_mib": before,
+                "peak_after_mib": peak_rss_mib(),
+            }
+        )
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=1480)
+    parser.add_argument("--child", choices=MODES)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.items)
+        return
+
+    print(f"items={args.items}")
+    for mode in MODES:
+        proc = subprocess.run(
+            [sys.executable, __file__, "--items", str(args.items), "--child", mode],
+            check=True,
+            capture_output=True,
+            text=True,
+        )
+        r = json.loads(proc.stdout.strip().splitlines()[-1])
+        delta = r["peak_after_mib"] - r["peak_before_mib"]
+        print(
+            f"{r['mode']:>7}: {r['seconds'] * 1000:9.1f} ms  "
+            f"peak RSS {r['peak_before_mib']:7.1f} -> {r['peak_after_mib']:7.1f} MiB (+{delta:.1f})"
+        )
+
+
+if __name__ == "__main__":
+    main()
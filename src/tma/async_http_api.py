@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Iterable, List, Tuple
+
+import aiohttp
+
+from .config import ASYNC_MAX_IN_FLIGHT, BASE_URL, LISTINGS_PAGE_SIZE, RATE_LIMIT_PER_MIN, RETRIES, TIMEOUT
+from .http_api import AUTH_MODE_CACHE, AuthModeCache, RowCache, row_from_itemmarket
+from .rate_limit import AsyncTokenBucket
+
+
+def async_session(max_in_flight: int = ASYNC_MAX_IN_FLIGHT) -> aiohttp.ClientSession:
+    connector = aiohttp.TCPConnector(limit=max_in_flight, limit_per_host=max_in_flight)
+    return aiohttp.ClientSession(
+        connector=connector,
+        timeout=aiohttp.ClientTimeout(total=TIMEOUT),
+        headers={
+            "accept": "application/json",
+            "User-Agent": "torn-itemmarket-web/1.1",
+        },
+    )
+
+
+async def attempt_call_async(
+    session: aiohttp.ClientSession,
+    bucket: AsyncTokenBucket,
+    api_key: str,
+    item_id: int,
+    mode: int,
+    base_url: str = BASE_URL,
+    offset: int = 0,
+) -> tuple[int | None, dict]:
+    url = f"{base_url}/market/{item_id}/itemmarket"
+    headers: dict[str, str] = {}
+    params: dict[str, int | str] = {"limit": LISTINGS_PAGE_SIZE, "offset": offset}
+
+    if mode == 1:
+        headers["Authorization"] = f"Apikey {api_key}"
+    elif mode == 2:
+        headers["Authorization"] = f"ApiKey {api_key}"
+    else:
+        params["key"] = api_key
+
+    await bucket.take(1)
+    async with session.get(url, headers=headers, params=params) as resp:
+        return resp.status, await resp.json(content_type=None)
+
+
+async def fetch_100_async(
+    session: aiohttp.ClientSession,
+    bucket: AsyncTokenBucket,
+    api_key: str,
+    item_id: int,
+    my_quantity: int,
+    base_url: str = BASE_URL,
+    auth_modes: AuthModeCache = AUTH_MODE_CACHE,
+    offset: int = 0,
+) -> dict:
+    backoff = 0.8
+
+    for _ in range(1, RETRIES + 1):
+        modes = auth_modes.modes_to_try(api_key)
+        for mode in modes:
+            try:
+                status, data = await attempt_call_async(session, bucket, api_key, item_id, mode, base_url, offset)
+            except Exception as exc:
+                status, data = None, {"error": {"code": -1, "error": str(exc) or type(exc).__name__}}
+
+            if isinstance(data, dict) and "error" in data:
+                code = data["error"].get("code")
+                msg = data["error"].get("error")
+
+                if code == 2 and mode != modes[-1]:
+                    auth_modes.forget(api_key)
+                    continue
+
+                if code in (0, 10) or status in (429, 500, 502, 503, 504):
+                    await asyncio.sleep(backoff)
+                    backoff *= 1.6
+                    break
+
+                return {
+                    "item_id": item_id,
+                    "my_quantity": my_quantity,
+                    "error": f"API error {code}: {msg}",
+                }
+
+            auth_modes.remember(api_key, mode)
+            return row_from_itemmarket(data, item_id, my_quantity)
+
+        await asyncio.sleep(backoff)
+        backoff *= 1.6
+
+    return {"item_id": item_id, "my_quantity": my_quantity, "error": "Exhausted retries"}
+
+
+async def fetch_many_async(
+    api_key: str,
+    items: Iterable[Tuple[int, int]],
+    rate_per_min: int = RATE_LIMIT_PER_MIN,
+    max_in_flight: int = ASYNC_MAX_IN_FLIGHT,
+    base_url: str = BASE_URL,
+    session: aiohttp.ClientSession | None = None,
+    bucket: AsyncTokenBucket | None = None,
+    cache: RowCache | None = None,
+    force_refresh: bool = False,
+) -> List[dict]:
+    items = list(items)
+    if not items:
+        return []
+
+    bucket = bucket or AsyncTokenBucket(rate_per_min)
+    gate = asyncio.Semaphore(max(1, max_in_flight))
+
+    async def fetch_and_store(sess: aiohttp.ClientSession, item_id: int, qty: int) -> dict:
+        async with gate:
+            row = await fetch_100_async(sess, bucket, api_key, item_id, qty, base_url)
+        if cache is not None:
+            cache.put(row)
+        return row
+
+    # Unlike fetch_many, nothing is coalesced here: each call runs on its own
+    # event loop and a batch never repeats an item, so concurrent sessions on
+    # this path can fetch the same item twice.
+    async def run(sess: aiohttp.ClientSession, item_id: int, qty: int) -> dict:
+        try:
+            if cache is not None:
+                cached = cache.get(item_id, qty, force_refresh=force_refresh)
+                if cached is not None:
+                    return cached
+
+            return await fetch_and_store(sess, item_id, qty)
+        except Exception as exc:
+            return {"item_id": item_id, "my_quantity": qty, "error": f"Fetch failed: {exc}"}
+
+    async def run_all(sess: aiohttp.ClientSession) -> List[dict]:
+        rows: List[dict] = []
+        pending = items
+        if AUTH_MODE_CACHE.get(api_key) is None:
+            rows.append(await run(sess, *pending[0]))
+            pending = pending[1:]
+        rows.extend(await asyncio.gather(*(run(sess, iid, qty) for iid, qty in pending)))
+        return rows
+
+    if session is not None:
+        return await run_all(session)
+
+    async with async_session(max_in_flight) as sess:
+        return await run_all(sess)
+
+
+def fetch_many_blocking(
+    api_key: str,
+    items: Iterable[Tuple[int, int]],
+    rate_per_min: int = RATE_LIMIT_PER_MIN,
+    max_in_flight: int = ASYNC_MAX_IN_FLIGHT,
+    base_url: str = BASE_URL,
+    cache: RowCache | None = None,
+    force_refresh: bool = False,
+) -> List[dict]:
+    # Entry point for synchronous callers (the Streamlit script thread, CLI jobs):
+    # each call runs its own event loop for the duration of the batch.
+    return asyncio.run(
+        fetch_many_async(
+            api_key,
+            items,
+            rate_per_min,
+            max_in_flight,
+            base_url,
+            cache=cache,
+            force_refresh=force_refresh,
+        )
+    )
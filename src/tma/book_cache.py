@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Sequence
+
+import numpy as np
+
+from .config import BOOK_CACHE_MAX_BYTES, BOOK_CACHE_TTL_SECONDS
+from .http_api import RowCache, listings_from_row, row_from_listings
+
+_ENTRY_OVERHEAD_BYTES = 256
+
+
+class BookCache:
+    def __init__(
+        self,
+        max_bytes: int = BOOK_CACHE_MAX_BYTES,
+        ttl_seconds: float = BOOK_CACHE_TTL_SECONDS,
+    ) -> None:
+        self.max_bytes = int(max_bytes)
+        self.ttl_seconds = float(ttl_seconds)
+        self.entries: OrderedDict[int, tuple[float, int, tuple, np.ndarray, float]] = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.lock = threading.Lock()
+
+    def _drop(self, item_id: int) -> None:
+        _, size, _, _, _ = self.entries.pop(item_id)
+        self.nbytes -= size
+
+    def get(self, item_id: int, my_quantity: int, force_refresh: bool = False) -> dict | None:
+        item_id = int(item_id)
+        with self.lock:
+            entry = self.entries.get(item_id)
+            if force_refresh or entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, _, meta, pairs, fetched_at = entry
+            remaining = expires_at - time.monotonic()
+            if remaining <= 0:
+                self._drop(item_id)
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(item_id)
+            self.hits += 1
+
+        return row_from_listings(
+            item_id, *meta, my_quantity, pairs, fetched_at=fetched_at, expires_at=time.time() + remaining
+        )
+
+    def put(self, row: dict) -> None:
+        if "error" in row:
+            return
+
+        item_id = int(row["item_id"])
+        meta = (row.get("item_name"), row.get("item_type"), row.get("average_price"))
+        pairs = listings_from_row(row)
+        pairs.setflags(write=False)
+        size = pairs.nbytes + sum(sys.getsizeof(v) for v in meta) + _ENTRY_OVERHEAD_BYTES
+        if size > self.max_bytes:
+            return
+
+        # The TTL runs from when the book was fetched, and a row handed down
+        # by a lower cache tier never outlives that tier's own expiry.
+        now = time.time()
+        fetched_at = row.get("fetched_at") or now
+        ttl = min(fetched_at + self.ttl_seconds, row.get("expires_at") or float("inf")) - now
+        if ttl <= 0:
+            return
+
+        with self.lock:
+            if item_id in self.entries:
+                self._drop(item_id)
+            self.entries[item_id] = (time.monotonic() + ttl, size, meta, pairs, fetched_at)
+            self.nbytes += size
+
+            while self.nbytes > self.max_bytes:
+                oldest = next(iter(self.entries))
+                self._drop(oldest)
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "entries": len(self.entries),
+                "bytes": self.nbytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.nbytes = 0
+
+
+class TieredCache:
+    def __init__(self, tiers: Sequence[RowCache]) -> None:
+        self.tiers = list(tiers)
+
+    def get(self, item_id: int, my_quantity: int, force_refresh: bool = False) -> dict | None:
+        for depth, tier in enumerate(self.tiers):
+            row = tier.get(item_id, my_quantity, force_refresh=force_refresh)
+            if row is not None:
+                for upper in self.tiers[:depth]:
+                    upper.put(row)
+                return row
+        return None
+
+    def put(self, row: dict) -> None:
+        for tier in self.tiers:
+            tier.put(row)
+
+
+_shared_lock = threading.Lock()
+_shared_book_cache: BookCache | None = None
+
+
+def shared_book_cache() -> BookCache:
+    global _shared_book_cache
+    with _shared_lock:
+        if _shared_book_cache is None:
+            _shared_book_cache = BookCache()
+        return _shared_book_cache
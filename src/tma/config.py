@@ -0,0 +1,15 @@
+BASE_URL = "https://api.torn.com/v2"
+MAX_WORKERS = 5
+RATE_LIMIT_PER_MIN = 90
+RETRIES = 3
+TIMEOUT = 15
+ASYNC_MAX_IN_FLIGHT = 100
+USE_ASYNC_CLIENT = False
+SNAPSHOT_TTL_SECONDS = 300
+BOOK_CACHE_TTL_SECONDS = 120
+BOOK_CACHE_MAX_BYTES = 64 * 1024 * 1024
+LISTINGS_PAGE_SIZE = 100
+DEEP_BOOK_MAX_PAGES = 3
+HISTORY_ITEM_GROUP_SIZE = 100
+HISTORY_COMPACT_MIN_FILES = 16
+FUZZY_MATCH_THRESHOLD = 85.0
@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import re
+import unicodedata
+from difflib import SequenceMatcher
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+GRAM_SIZE = 3
+SHORTLIST_SIZE = 8
+# Candidates sharing fewer trigrams than this (Dice coefficient) are never
+# scored; it keeps unrelated UI lines off the expensive path.
+MIN_GRAM_SIMILARITY = 0.3
+_GRAM_SEP = "\0"
+
+_QUOTES = str.maketrans({c: "'" for c in "\u2018\u2019\u201a\u201b\u2032`\u00b4"} | {c: '"' for c in "\u201c\u201d\u201e\u201f\u2033"})
+_NON_ALNUM_RE = re.compile(r"[\W_]+")
+
+
+def normalize_key(s: str) -> str:
+    # Case-, quote-, punctuation- and whitespace-insensitive form of a name.
+    # Apostrophes are dropped so "Lion's" and "Lions" agree; any other run of
+    # non-alphanumerics separates words.
+    s = unicodedata.normalize("NFKC", s).casefold().translate(_QUOTES).replace("'", "")
+    return " ".join(_NON_ALNUM_RE.sub(" ", s).split())
+
+
+def _grams(text: str) -> set[str]:
+    padded = f"  {text} "
+    return {padded[i : i + GRAM_SIZE] for i in range(len(padded) - GRAM_SIZE + 1)}
+
+
+def similarity(a: str, b: str) -> float:
+    # 0-100: the better of the plain and the token-sorted edit ratio, so word
+    # order and small typos are forgiven but extra or missing words are not.
+    a, b = normalize_key(a), normalize_key(b)
+    plain = SequenceMatcher(None, a, b, autojunk=False).ratio()
+    ordered = SequenceMatcher(None, " ".join(sorted(a.split())), " ".join(sorted(b.split())), autojunk=False).ratio()
+    return 100.0 * max(plain, ordered)
+
+
+class NGramIndex:
+    # Character trigram inverted index over the dictionary names. A query only
+    # touches the postings of its own trigrams, and only the best SHORTLIST_SIZE
+    # names by trigram overlap are scored with similarity().
+    def __init__(self, names: Sequence[str], grams: Sequence[str], offsets: np.ndarray, postings: np.ndarray) -> None:
+        self.names = list(names)
+        self.postings = postings
+        self.gram_slices: Dict[str, Tuple[int, int]] = {
+            g: (int(offsets[i]), int(offsets[i + 1])) for i, g in enumerate(grams)
+        }
+        self.gram_counts = np.bincount(postings, minlength=len(self.names)).astype(np.float64)
+
+    @classmethod
+    def build(cls, names: Sequence[str]) -> "NGramIndex":
+        by_gram: Dict[str, List[int]] = {}
+        for i, name in enumerate(names):
+            for g in _grams(normalize_key(name)):
+                by_gram.setdefault(g, []).append(i)
+        grams = sorted(by_gram)
+        lists = [by_gram[g] for g in grams]
+        offsets = np.zeros(len(grams) + 1, dtype=np.int64)
+        np.cumsum([len(p) for p in lists], out=offsets[1:])
+        postings = np.fromiter((i for p in lists for i in p), dtype=np.int32, count=int(offsets[-1]))
+        return cls(names, grams, offsets, postings)
+
+    @classmethod
+    def from_arrays(cls, names: Sequence[str], arrays: Dict[str, np.ndarray]) -> "NGramIndex":
+        grams = arrays["gram_keys"].tobytes().decode("utf-8").split(_GRAM_SEP)
+        return cls(names, grams, arrays["gram_offsets"], arrays["gram_postings"])
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        grams = list(self.gram_slices)
+        offsets = np.array([self.gram_slices[g][0] for g in grams] + [self.postings.size], dtype=np.int64)
+        return {
+            "gram_keys": np.frombuffer(_GRAM_SEP.join(grams).encode("utf-8"), dtype=np.uint8),
+            "gram_offsets": offsets,
+            "gram_postings": np.asarray(self.postings, dtype=np.int32),
+        }
+
+    def shortlist(self, query: str, k: int = SHORTLIST_SIZE) -> List[int]:
+        grams = _grams(normalize_key(query))
+        hits = [self.postings[s[0] : s[1]] for s in map(self.gram_slices.get, grams) if s is not None]
+        if not hits:
+            return []
+        shared = np.bincount(np.concatenate(hits), minlength=len(self.names))
+        dice = 2.0 * shared / (len(grams) + self.gram_counts)
+        k = min(k, dice.size)
+        top = np.argpartition(-dice, k - 1)[:k]
+        top = top[dice[top] >= MIN_GRAM_SIMILARITY]
+        return top[np.argsort(-dice[top], kind="stable")].tolist()
+
+    def best_match(self, query: str, threshold: float) -> Optional[Tuple[str, float]]:
+        # A tie between different names (e.g. ones that differ only in
+        # punctuation) is ambiguous and returns None.
+        best: Optional[Tuple[str, float]] = None
+        tied = False
+        for i in self.shortlist(query):
+            score = similarity(query, self.names[i])
+            if score < threshold:
+                continue
+            if best is None or score > best[1]:
+                best = (self.names[i], score)
+                tied = False
+            elif score == best[1]:
+                tied = True
+        return None if tied else best
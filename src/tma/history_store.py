@@ -0,0 +1,315 @@
+from __future__ import annotations
+
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from pyarrow import fs
+
+from .config import HISTORY_COMPACT_MIN_FILES, HISTORY_ITEM_GROUP_SIZE
+from .incremental import book_digest
+
+TIMESTAMP = pa.timestamp("ms", tz="UTC")
+
+PARTITIONING = ds.partitioning(pa.schema([("date", pa.string()), ("item_group", pa.int32())]), flavor="hive")
+
+BOOK_SCHEMA = pa.schema(
+    [
+        ("fetched_at", TIMESTAMP),
+        ("item_id", pa.int64()),
+        ("rank", pa.int32()),
+        ("price", pa.int64()),
+        ("amount", pa.int64()),
+    ]
+)
+
+SUMMARY_SCHEMA = pa.schema(
+    [
+        ("fetched_at", TIMESTAMP),
+        ("item_id", pa.int64()),
+        ("item_name", pa.string()),
+        ("item_type", pa.string()),
+        ("average_price_reported", pa.float64()),
+        ("my_quantity", pa.int64()),
+        ("num_listings", pa.int64()),
+        ("num_suspected_anchors", pa.int64()),
+        ("fast_sell_price", pa.int64()),
+        ("fair_price", pa.int64()),
+        ("greedy_price", pa.int64()),
+        ("clean_median_price", pa.int64()),
+        ("clean_q1_price", pa.int64()),
+        ("clean_q3_price", pa.int64()),
+    ]
+)
+
+Timestamp = Union[float, datetime]
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def _to_datetime(ts: Timestamp) -> datetime:
+    if isinstance(ts, datetime):
+        return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+    return datetime.fromtimestamp(ts, tz=timezone.utc)
+
+
+def _to_millis(when: datetime) -> int:
+    return (when - EPOCH) // timedelta(milliseconds=1)
+
+
+def _timestamps(ms: np.ndarray) -> pa.Array:
+    return pa.array(np.asarray(ms, dtype=np.int64)).cast(TIMESTAMP)
+
+
+def _dates(ms: np.ndarray) -> pa.Array:
+    days = np.asarray(ms, dtype=np.int64) // 86_400_000
+    return pa.array(days.astype("datetime64[D]").astype(str), pa.string())
+
+
+class HistoryStore:
+    # Append-only columnar history under <root>/books and <root>/summary, both
+    # hive-partitioned by UTC date and item_id // HISTORY_ITEM_GROUP_SIZE. Every
+    # append adds at most one file per partition; once a partition holds
+    # compact_min_files files they are merged into one, so frequent small
+    # appends don't leave scans opening thousands of tiny files.
+    def __init__(
+        self,
+        root: Path | str,
+        group_size: int = HISTORY_ITEM_GROUP_SIZE,
+        compact_min_files: int = HISTORY_COMPACT_MIN_FILES,
+    ) -> None:
+        self.root = Path(root)
+        self.group_size = group_size
+        self.compact_min_files = compact_min_files
+        # Reentrant: append() reads the history while holding it, and reads
+        # hold it so compaction never removes a file a scan is about to open.
+        self.lock = threading.RLock()
+        # Last recorded digest per item: cache hits and unchanged books are not
+        # written again, so the history only grows when a book actually moves.
+        # Items not seen yet by this process are checked against the stored
+        # history instead, so a restart doesn't record cached books twice.
+        self.last_digest: Dict[int, str] = {}
+        self.filesystem = fs.LocalFileSystem(use_mmap=True)
+
+    def _write(self, kind: str, table: pa.Table, written_at: int) -> None:
+        # Rows are partitioned by the date of their own fetched_at.
+        groups = pa.array(table["item_id"].to_numpy() // self.group_size, type=pa.int32())
+        table = table.append_column("date", _dates(table["fetched_at"].cast(pa.int64()).to_numpy()))
+        table = table.append_column("item_group", groups)
+        ds.write_dataset(
+            table,
+            self.root / kind,
+            format="parquet",
+            partitioning=PARTITIONING,
+            basename_template=f"part-{written_at}-{uuid.uuid4().hex[:8]}-{{i}}.parquet",
+            existing_data_behavior="overwrite_or_ignore",
+        )
+
+        touched = set(zip(table["date"].to_pylist(), groups.to_pylist()))
+        for date, group in touched:
+            self._compact_partition(kind, self.root / kind / f"date={date}" / f"item_group={group}", written_at)
+
+    def _compact_partition(self, kind: str, partition: Path, written_at: int, min_files: Optional[int] = None) -> bool:
+        files = sorted(partition.glob("*.parquet"))
+        if len(files) < max(2, self.compact_min_files if min_files is None else min_files):
+            return False
+
+        schema = BOOK_SCHEMA if kind == "books" else SUMMARY_SCHEMA
+        table = pa.concat_tables([pq.read_table(f, columns=schema.names, partitioning=None) for f in files])
+        keys = [(c, "ascending") for c in ("fetched_at", "item_id", "rank") if c in schema.names]
+        table = table.cast(schema).sort_by(keys)
+
+        # Written under an ignored "_" name and renamed into place before the
+        # old files go, so a crash can leave duplicates but never lose rows.
+        tmp = partition / f"_compact-{uuid.uuid4().hex}.parquet"
+        pq.write_table(table, tmp)
+        tmp.replace(partition / f"part-{written_at}-{uuid.uuid4().hex[:8]}-c.parquet")
+        for f in files:
+            f.unlink()
+        return True
+
+    def compact(self, min_files: int = 2) -> int:
+        # Merges every partition holding at least min_files files, e.g. to
+        # tidy up finished days. Returns the number of partitions rewritten.
+        written_at = _to_millis(_to_datetime(time.time()))
+        merged = 0
+        with self.lock:
+            for kind in ("books", "summary"):
+                for partition in sorted((self.root / kind).glob("date=*/item_group=*")):
+                    merged += self._compact_partition(kind, partition, written_at, min_files)
+        return merged
+
+    def _recorded(self, item_ids: Sequence[int], stamps: Sequence[int]) -> set:
+        # (item_id, fetched_at ms) pairs already in the books history.
+        table = self._scan(
+            "books",
+            BOOK_SCHEMA,
+            item_ids,
+            EPOCH + timedelta(milliseconds=min(stamps)),
+            EPOCH + timedelta(milliseconds=max(stamps)),
+            ["item_id", "fetched_at"],
+        )
+        if table is None:
+            return set()
+        ids = table["item_id"].to_numpy()
+        ms = table["fetched_at"].cast(pa.int64()).to_numpy()
+        return set(zip(ids.tolist(), ms.tolist()))
+
+    def append(self, books: Iterable[dict], summary: Optional[pd.DataFrame] = None, fetched_at: Optional[Timestamp] = None) -> int:
+        # Records every book that changed since it was last recorded, together
+        # with its summary row, stamped with the book's own fetched_at (the
+        # fetched_at argument, or now, for books without one). Timestamps have
+        # millisecond resolution. Returns the number of items written.
+        now = _to_millis(_to_datetime(time.time()))
+        default = now if fetched_at is None else _to_millis(_to_datetime(fetched_at))
+        books = [b for b in books if "error" not in b and "price" in b]
+
+        with self.lock:
+            fresh: List[dict] = []
+            stamps: Dict[int, int] = {}
+            digests: Dict[int, str] = {}
+            for book in books:
+                iid = int(book["item_id"])
+                digest = book_digest(book)
+                if digests.get(iid, self.last_digest.get(iid)) != digest:
+                    digests[iid] = digest
+                    stamps[iid] = _to_millis(_to_datetime(book["fetched_at"])) if book.get("fetched_at") else default
+                    fresh.append(book)
+
+            unseen = [iid for iid in stamps if iid not in self.last_digest]
+            if unseen:
+                recorded = self._recorded(unseen, [stamps[iid] for iid in unseen])
+                fresh = [b for b in fresh if (int(b["item_id"]), stamps[int(b["item_id"])]) not in recorded]
+            if not fresh:
+                self.last_digest.update(digests)
+                return 0
+
+            counts = np.array([len(b["price"]) for b in fresh], dtype=np.int64)
+            n = int(counts.sum())
+            if n:
+                starts = np.repeat(np.cumsum(counts) - counts, counts)
+                table = pa.table(
+                    {
+                        "fetched_at": _timestamps(np.repeat([stamps[int(b["item_id"])] for b in fresh], counts)),
+                        "item_id": np.repeat(np.array([int(b["item_id"]) for b in fresh], dtype=np.int64), counts),
+                        "rank": (np.arange(n, dtype=np.int64) - starts + 1).astype(np.int32),
+                        "price": np.concatenate([np.asarray(b["price"], dtype=np.int64) for b in fresh]),
+                        "amount": np.concatenate([np.asarray(b["amount"], dtype=np.int64) for b in fresh]),
+                    },
+                    schema=BOOK_SCHEMA,
+                )
+                self._write("books", table, now)
+
+            if summary is not None and not summary.empty:
+                ids = {int(b["item_id"]) for b in fresh}
+                rows = summary[summary["item_id"].isin(ids)]
+                if not rows.empty:
+                    table = pa.Table.from_pandas(
+                        rows[SUMMARY_SCHEMA.names[1:]], schema=SUMMARY_SCHEMA.remove(0), preserve_index=False
+                    )
+                    ms = rows["item_id"].map(stamps).to_numpy()
+                    table = table.add_column(0, SUMMARY_SCHEMA.field(0), _timestamps(ms))
+                    self._write("summary", table, now)
+
+            # Only once both writes succeeded: a failed append is retried in
+            # full by the next call.
+            self.last_digest.update(digests)
+            return len(fresh)
+
+    def _scan(
+        self,
+        kind: str,
+        schema: pa.Schema,
+        item_ids: Optional[Sequence[int]],
+        start: Optional[Timestamp],
+        end: Optional[Timestamp],
+        columns: Optional[List[str]],
+    ) -> Optional[pa.Table]:
+        with self.lock:
+            return self._scan_locked(kind, schema, item_ids, start, end, columns)
+
+    def _scan_locked(
+        self,
+        kind: str,
+        schema: pa.Schema,
+        item_ids: Optional[Sequence[int]],
+        start: Optional[Timestamp],
+        end: Optional[Timestamp],
+        columns: Optional[List[str]],
+    ) -> Optional[pa.Table]:
+        path = self.root / kind
+        if not path.exists():
+            return None
+
+        dataset = ds.dataset(
+            str(path),
+            format="parquet",
+            partitioning=PARTITIONING,
+            filesystem=self.filesystem,
+            schema=pa.unify_schemas([schema, PARTITIONING.schema]),
+        )
+
+        # Conditions on date and item_group prune whole directories before any
+        # file is opened; the row-level conditions then run on the survivors.
+        cond = None
+
+        def both(a, b):
+            return b if a is None else a & b
+
+        if item_ids is not None:
+            ids = sorted({int(i) for i in item_ids})
+            groups = sorted({i // self.group_size for i in ids})
+            cond = both(cond, ds.field("item_group").isin(groups))
+            cond = both(cond, ds.field("item_id").isin(ids))
+        if start is not None:
+            start = _to_datetime(start)
+            cond = both(cond, ds.field("date") >= start.strftime("%Y-%m-%d"))
+            cond = both(cond, ds.field("fetched_at") >= pa.scalar(start, type=TIMESTAMP))
+        if end is not None:
+            end = _to_datetime(end)
+            cond = both(cond, ds.field("date") <= end.strftime("%Y-%m-%d"))
+            cond = both(cond, ds.field("fetched_at") <= pa.scalar(end, type=TIMESTAMP))
+
+        return dataset.to_table(columns=columns or schema.names, filter=cond)
+
+    def _read(
+        self,
+        kind: str,
+        schema: pa.Schema,
+        item_ids: Optional[Sequence[int]],
+        start: Optional[Timestamp],
+        end: Optional[Timestamp],
+        columns: Optional[List[str]],
+    ) -> pd.DataFrame:
+        table = self._scan(kind, schema, item_ids, start, end, columns)
+        if table is None:
+            return pd.DataFrame({name: pd.Series(dtype=f.type.to_pandas_dtype()) for name, f in zip(schema.names, schema)})
+        df = table.to_pandas()
+        keys = [c for c in ("fetched_at", "item_id", "rank") if c in df.columns]
+        return df.sort_values(keys, kind="stable", ignore_index=True) if keys else df
+
+    def read_books(
+        self,
+        item_ids: Optional[Sequence[int]] = None,
+        start: Optional[Timestamp] = None,
+        end: Optional[Timestamp] = None,
+        columns: Optional[List[str]] = None,
+    ) -> pd.DataFrame:
+        return self._read("books", BOOK_SCHEMA, item_ids, start, end, columns)
+
+    def read_summary(
+        self,
+        item_ids: Optional[Sequence[int]] = None,
+        start: Optional[Timestamp] = None,
+        end: Optional[Timestamp] = None,
+        columns: Optional[List[str]] = None,
+    ) -> pd.DataFrame:
+        return self._read("summary", SUMMARY_SCHEMA, item_ids, start, end, columns)
@@ -0,0 +1,304 @@
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, List, Protocol, Tuple
+
+import numpy as np
+import requests
+
+from .config import BASE_URL, DEEP_BOOK_MAX_PAGES, LISTINGS_PAGE_SIZE, MAX_WORKERS, RETRIES, TIMEOUT
+from .rate_limit import TokenBucket
+from .single_flight import SingleFlight
+
+
+AUTH_MODES = (1, 2, 3)
+
+
+class RowCache(Protocol):
+    def get(self, item_id: int, my_quantity: int, force_refresh: bool = False) -> dict | None: ...
+
+    def put(self, row: dict) -> None: ...
+
+
+class AuthModeCache:
+    def __init__(self) -> None:
+        self.modes: dict[str, int] = {}
+        self.lock = threading.Lock()
+
+    def get(self, api_key: str) -> int | None:
+        with self.lock:
+            return self.modes.get(api_key)
+
+    def remember(self, api_key: str, mode: int) -> None:
+        with self.lock:
+            self.modes[api_key] = mode
+
+    def forget(self, api_key: str) -> None:
+        with self.lock:
+            self.modes.pop(api_key, None)
+
+    def modes_to_try(self, api_key: str) -> tuple[int, ...]:
+        # The known-good mode goes first; the others are only probed again if
+        # it starts returning an auth error.
+        known = self.get(api_key)
+        if known is None:
+            return AUTH_MODES
+        return (known,) + tuple(m for m in AUTH_MODES if m != known)
+
+
+AUTH_MODE_CACHE = AuthModeCache()
+ITEM_FLIGHTS = SingleFlight()
+
+
+def session_for_requests() -> requests.Session:
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(
+        pool_connections=MAX_WORKERS * 10,
+        pool_maxsize=MAX_WORKERS * 10,
+    )
+    session.mount("https://", adapter)
+    session.headers.update(
+        {
+            "accept": "application/json",
+            "User-Agent": "torn-itemmarket-web/1.1",
+        }
+    )
+    return session
+
+
+def attempt_call(
+    session: requests.Session,
+    bucket: TokenBucket,
+    api_key: str,
+    item_id: int,
+    mode: int,
+    offset: int = 0,
+) -> tuple[int | None, dict]:
+    url = f"{BASE_URL}/market/{item_id}/itemmarket"
+    headers: dict[str, str] = {}
+    params: dict[str, int | str] = {"limit": LISTINGS_PAGE_SIZE, "offset": offset}
+
+    if mode == 1:
+        headers["Authorization"] = f"Apikey {api_key}"
+    elif mode == 2:
+        headers["Authorization"] = f"ApiKey {api_key}"
+    else:
+        params["key"] = api_key
+
+    bucket.take(1)
+    resp = session.get(url, headers=headers, params=params, timeout=TIMEOUT)
+    return resp.status_code, resp.json()
+
+
+def row_from_itemmarket(data: dict | None, item_id: int, my_quantity: int) -> dict:
+    itemmarket = (data or {}).get("itemmarket", {}) or {}
+    item = itemmarket.get("item", {}) or {}
+    listings = itemmarket.get("listings", []) or []
+
+    pairs = [
+        (listing.get("price"), listing.get("amount"))
+        for listing in listings[:LISTINGS_PAGE_SIZE]
+        if listing.get("price") is not None and listing.get("amount") is not None
+    ]
+
+    return {
+        "item_id": item.get("id", item_id),
+        "item_name": item.get("name"),
+        "item_type": item.get("type"),
+        "average_price": item.get("average_price"),
+        "my_quantity": my_quantity,
+        "price": np.fromiter((int(p) for p, _ in pairs), dtype=np.int64, count=len(pairs)),
+        "amount": np.fromiter((int(a) for _, a in pairs), dtype=np.int64, count=len(pairs)),
+        "fetched_at": time.time(),
+    }
+
+
+def listings_from_row(row: dict) -> np.ndarray:
+    return np.stack([row["price"], row["amount"]]).astype(np.int64, copy=False)
+
+
+def row_from_listings(
+    item_id: int,
+    item_name: str | None,
+    item_type: str | None,
+    average_price: float | None,
+    my_quantity: int,
+    pairs: np.ndarray,
+    fetched_at: float | None = None,
+    expires_at: float | None = None,
+) -> dict:
+    # Used by the caches; from_cache marks rows that cost no API call, and
+    # expires_at (wall clock) is when the serving cache stops trusting it.
+    return {
+        "item_id": int(item_id),
+        "item_name": item_name,
+        "item_type": item_type,
+        "average_price": average_price,
+        "my_quantity": my_quantity,
+        "price": pairs[0],
+        "amount": pairs[1],
+        "fetched_at": fetched_at,
+        "expires_at": expires_at,
+        "from_cache": True,
+    }
+
+
+def fetch_100(
+    session: requests.Session,
+    bucket: TokenBucket,
+    api_key: str,
+    item_id: int,
+    my_quantity: int,
+    auth_modes: AuthModeCache = AUTH_MODE_CACHE,
+    offset: int = 0,
+) -> dict:
+    backoff = 0.8
+
+    for _ in range(1, RETRIES + 1):
+        modes = auth_modes.modes_to_try(api_key)
+        for mode in modes:
+            try:
+                status, data = attempt_call(session, bucket, api_key, item_id, mode, offset)
+            except Exception as exc:
+                status, data = None, {"error": {"code": -1, "error": str(exc)}}
+
+            if isinstance(data, dict) and "error" in data:
+                code = data["error"].get("code")
+                msg = data["error"].get("error")
+
+                if code == 2 and mode != modes[-1]:
+                    auth_modes.forget(api_key)
+                    continue
+
+                if code in (0, 10) or status in (429, 500, 502, 503, 504):
+                    time.sleep(backoff)
+                    backoff *= 1.6
+                    break
+
+                return {
+                    "item_id": item_id,
+                    "my_quantity": my_quantity,
+                    "error": f"API error {code}: {msg}",
+                }
+
+            auth_modes.remember(api_key, mode)
+            return row_from_itemmarket(data, item_id, my_quantity)
+
+        time.sleep(backoff)
+        backoff *= 1.6
+
+    return {"item_id": item_id, "my_quantity": my_quantity, "error": "Exhausted retries"}
+
+
+def fetch_many(
+    session: requests.Session,
+    bucket: TokenBucket,
+    api_key: str,
+    items: Iterable[Tuple[int, int]],
+    max_workers: int = MAX_WORKERS,
+    cache: RowCache | None = None,
+    force_refresh: bool = False,
+    flights: SingleFlight = ITEM_FLIGHTS,
+) -> List[dict]:
+    # The bucket is shared by every worker, so concurrency only hides latency;
+    # the request rate is still capped by the limiter.
+    items = list(items)
+    if not items:
+        return []
+
+    def fetch_and_store(item_id: int, qty: int) -> dict:
+        row = fetch_100(session, bucket, api_key, item_id, qty)
+        if cache is not None:
+            cache.put(row)
+        return row
+
+    def run(item: Tuple[int, int]) -> dict:
+        item_id, qty = item
+        try:
+            if cache is not None:
+                cached = cache.get(item_id, qty, force_refresh=force_refresh)
+                if cached is not None:
+                    return cached
+
+            # Concurrent requests for the same item (other workers, other sessions)
+            # share one API call; each caller gets its own copy with its quantity.
+            # An error row (bad key, rate limit) only stands for the key that got
+            # it, so callers with another key retry with their own.
+            owner, row = flights.do(item_id, lambda: (api_key, fetch_and_store(item_id, qty)))
+            if "error" in row and owner != api_key:
+                _, row = flights.do((item_id, api_key), lambda: (api_key, fetch_and_store(item_id, qty)))
+            return {**row, "my_quantity": qty}
+        except Exception as exc:
+            return {"item_id": item_id, "my_quantity": qty, "error": f"Fetch failed: {exc}"}
+
+    rows: List[dict] = []
+    if AUTH_MODE_CACHE.get(api_key) is None:
+        # Negotiate the auth mode on one item before fanning out, so the workers
+        # don't all probe the same modes in parallel.
+        rows.append(run(items[0]))
+        items = items[1:]
+
+    workers = max(1, min(max_workers, len(items)))
+    if workers == 1:
+        return rows + [run(item) for item in items]
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tma-fetch") as pool:
+        return rows + list(pool.map(run, items))
+
+
+def book_is_exhausted(row: dict) -> bool:
+    # Pages are fetched LISTINGS_PAGE_SIZE at a time, so a book whose length is
+    # not a whole number of full pages has already returned its last listing.
+    n = len(row["price"])
+    return n == 0 or n % LISTINGS_PAGE_SIZE != 0
+
+
+def deepen_books(
+    session: requests.Session,
+    bucket: TokenBucket,
+    api_key: str,
+    rows: List[dict],
+    is_thin: Callable[[np.ndarray, np.ndarray], bool],
+    max_pages: int = DEEP_BOOK_MAX_PAGES,
+    cache: RowCache | None = None,
+) -> List[dict]:
+    # Fetches further offset pages only for books that is_thin rejects, up to
+    # max_pages per item. Other rows are returned untouched, and so are cache
+    # hits: a book is cached when it is fetched and again once deepened, so a
+    # cached book already had its chance and asking again inside the TTL would
+    # only repeat the same (possibly empty) page requests.
+    out: List[dict] = []
+    for row in rows:
+        if "error" in row or row.get("from_cache"):
+            out.append(row)
+            continue
+
+        deepened = False
+        while (
+            len(row["price"]) < max_pages * LISTINGS_PAGE_SIZE
+            and not book_is_exhausted(row)
+            and is_thin(row["price"], row["amount"])
+        ):
+            page = fetch_100(
+                session,
+                bucket,
+                api_key,
+                int(row["item_id"]),
+                row["my_quantity"],
+                offset=len(row["price"]),
+            )
+            if "error" in page or len(page["price"]) == 0:
+                break
+            row = {
+                **row,
+                "price": np.concatenate([row["price"], page["price"]]),
+                "amount": np.concatenate([row["amount"], page["amount"]]),
+            }
+            deepened = True
+
+        if deepened and cache is not None:
+            cache.put(row)
+        out.append(row)
+    return out
@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import hashlib
+import threading
+from typing import Dict, Iterable, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .market_enrichment import (
+    ENRICHED_FEATURE_COLUMNS,
+    LONG_COLUMNS,
+    SUMMARY_COLUMNS,
+    books_to_long,
+    build_summary_from_enriched,
+    enrich_all_items,
+)
+
+
+def book_digest(book: dict) -> str:
+    # Identity of a book for pricing purposes. my_quantity is left out: it does
+    # not affect any computed price and is patched in when results are reused.
+    h = hashlib.blake2b(digest_size=16)
+    h.update(repr((book.get("item_name"), book.get("item_type"), book.get("average_price"))).encode())
+    h.update(np.ascontiguousarray(book["price"], dtype="<i8").tobytes())
+    h.update(b"|")
+    h.update(np.ascontiguousarray(book["amount"], dtype="<i8").tobytes())
+    return h.hexdigest()
+
+
+ENRICHED_COLUMNS = LONG_COLUMNS + ENRICHED_FEATURE_COLUMNS
+
+
+class IncrementalPricer:
+    def __init__(self) -> None:
+        self.entries: Dict[int, Tuple[str, Dict[str, np.ndarray], dict]] = {}
+        self.lock = threading.Lock()
+        self.last_changed = 0
+        self.last_reused = 0
+
+    def price(self, books: Iterable[dict]) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        # Same (enriched, summary) as running the full pipeline on books, but
+        # only items whose book changed since the previous call are recomputed.
+        books = [b for b in books if "error" not in b and "price" in b]
+        latest: Dict[int, dict] = {int(b["item_id"]): b for b in books}
+        digests = {iid: book_digest(b) for iid, b in latest.items()}
+
+        with self.lock:
+            changed = [b for iid, b in latest.items() if self.entries.get(iid, ("",))[0] != digests[iid]]
+            self.last_changed = len(changed)
+            self.last_reused = len(latest) - len(changed)
+
+            if changed:
+                enriched = enrich_all_items(books_to_long(changed))
+                summary = build_summary_from_enriched(enriched)
+                summaries = {int(r["item_id"]): r for r in summary.to_dict("records")}
+                if not enriched.empty:
+                    columns = {c: enriched[c].to_numpy() for c in ENRICHED_COLUMNS}
+                    item_col = columns["item_id"]
+                    bounds = np.flatnonzero(np.r_[True, item_col[1:] != item_col[:-1], True])
+                    for start, end in zip(bounds[:-1], bounds[1:]):
+                        iid = int(item_col[start])
+                        rows = {c: v[start:end].copy() for c, v in columns.items()}
+                        self.entries[iid] = (digests[iid], rows, summaries[iid])
+                for iid in {int(b["item_id"]) for b in changed}.difference(summaries):
+                    # A book with no usable listings has nothing to cache.
+                    self.entries.pop(iid, None)
+
+            cached = [self.entries[iid] for iid in sorted(latest) if iid in self.entries]
+
+        if not cached:
+            return (
+                pd.DataFrame(columns=ENRICHED_COLUMNS),
+                pd.DataFrame(columns=SUMMARY_COLUMNS),
+            )
+
+        # Column-wise concatenation; pd.concat over thousands of small frames
+        # costs more than re-enriching everything. Entries priced in different
+        # batches may differ in dtype (e.g. an all-NaN average_price is float),
+        # and NumPy promotes them the same way a single full run would.
+        enriched = pd.DataFrame({c: np.concatenate([e[1][c] for e in cached]) for c in ENRICHED_COLUMNS})
+        summary = pd.DataFrame([e[2] for e in cached], columns=SUMMARY_COLUMNS)
+
+        quantities = {iid: b.get("my_quantity") for iid, b in latest.items()}
+        enriched["my_quantity"] = enriched["item_id"].map(quantities).to_numpy()
+        summary["my_quantity"] = summary["item_id"].map(quantities).to_numpy()
+        return enriched, summary
+
+    def forget(self, item_ids: Iterable[int] | None = None) -> None:
+        with self.lock:
+            if item_ids is None:
+                self.entries.clear()
+            else:
+                for iid in item_ids:
+                    self.entries.pop(int(iid), None)
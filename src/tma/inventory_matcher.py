@@ -1,10 +1,12 @@
 from __future__ import annotations
 
-import csv
 import re
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Dict, List, Optional, Set, Tuple
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, TextIO, Tuple
+
+from .config import FUZZY_MATCH_THRESHOLD
+from .item_dictionary import DICTIONARY_REGISTRY, DictionaryRegistry, load_dictionary
 
 
 @dataclass(frozen=True)
@@ -12,123 +14,171 @@ class MatchedItem:
     name: str
     item_id: int
     qty: int
+    score: float = 100.0
 
 
 @dataclass(frozen=True)
 class ParseResult:
     matched: List[MatchedItem]
     unmatched: List[Tuple[str, int]]
+    fuzzy: List[Tuple[str, str, float]] = field(default_factory=list)
 
 
 _QTY_LINE_RE = re.compile(r"^x\s*(\d+)$", re.IGNORECASE)
 _NAME_QTY_SAME_LINE_RE = re.compile(r"^(.*)\s+x\s*(\d+)$", re.IGNORECASE)
+# Everything str.splitlines() treats as a line boundary.
+_LINE_BREAKS = "\n\r\v\f\x1c\x1d\x1e\x85\u2028\u2029"
+# Distinct non-exact lines remembered per match_inventory call before the memo
+# is reset, so bulk reprocessing doesn't grow it without bound.
+_RESOLVE_MEMO_MAX = 100_000
 
 
 def _clean_line(line: str) -> str:
     return line.replace("\u00a0", " ").strip()
 
 
-def load_dictionary(dict_csv_path: str | Path) -> Dict[str, int]:
-    path = Path(dict_csv_path)
-    if not path.exists():
-        raise FileNotFoundError(f"Dictionary CSV not found: {path}")
-
-    with path.open("r", encoding="utf-8-sig", newline="") as f:
-        reader = csv.DictReader(f)
-        if not reader.fieldnames:
-            raise ValueError("Dictionary CSV has no header row.")
-
-        headers = {h.strip().lower(): h for h in reader.fieldnames}
-
-        def pick(*candidates: str) -> Optional[str]:
-            for c in candidates:
-                if c in headers:
-                    return headers[c]
+class AddListingsParser:
+    # Incremental form of parse_add_listings_text: feed() takes text chunks of
+    # any size and yields (name, qty, omitted) as soon as a later item closes
+    # a block; close() ends the input and yields the last one. Only the
+    # current partial line and the open block are held in memory.
+    def __init__(
+        self,
+        valid_item_names: Set[str],
+        resolve: Optional[Callable[[str], Optional[str]]] = None,
+    ) -> None:
+        # resolve is the fallback for lines that aren't exact item names: it
+        # gets the candidate name and returns a dictionary name, or None.
+        self.valid_item_names = valid_item_names
+        self.resolve = resolve
+        self.pending = ""
+        self.current_name: Optional[str] = None
+        self.current_qty = 1
+        self.current_omitted = False
+
+    def feed(self, chunk: str) -> Iterator[Tuple[str, int, bool]]:
+        lines = (self.pending + chunk).splitlines(keepends=True)
+        # The last piece may be a line cut by the chunk boundary.
+        self.pending = lines.pop() if lines and lines[-1] == lines[-1].rstrip(_LINE_BREAKS) else ""
+        for line in lines:
+            closed = self._line(line)
+            if closed is not None:
+                yield closed
+
+    def close(self) -> Iterator[Tuple[str, int, bool]]:
+        if self.pending:
+            line, self.pending = self.pending, ""
+            closed = self._line(line)
+            if closed is not None:
+                yield closed
+        closed = self._start(None, 1)
+        if closed is not None:
+            yield closed
+
+    def _start(self, name: Optional[str], qty: int) -> Optional[Tuple[str, int, bool]]:
+        closed = (self.current_name, self.current_qty, self.current_omitted) if self.current_name is not None else None
+        self.current_name = name
+        self.current_qty = qty
+        self.current_omitted = False
+        return closed
+
+    def _line(self, raw_line: str) -> Optional[Tuple[str, int, bool]]:
+        line = _clean_line(raw_line)
+        if not line:
             return None
 
-        name_col = pick("key", "name", "item_name", "item", "title")
-        id_col = pick("id", "item_id", "itemid")
-
-        if not name_col or not id_col:
-            raise ValueError(
-                "Dictionary CSV must contain a name column (key/name/item_name/...) "
-                "and an id column (id/item_id/itemid)."
-            )
-
-        mapping: Dict[str, int] = {}
-        for row in reader:
-            name = (row.get(name_col) or "").strip()
-            raw_id = (row.get(id_col) or "").strip()
-            if not name or not raw_id:
-                continue
-            try:
-                mapping[name] = int(raw_id)
-            except ValueError:
-                continue
-
-    if not mapping:
-        raise ValueError("Dictionary CSV loaded but produced an empty mapping (no valid rows).")
-
-    return mapping
-
-
-def parse_add_listings_text(raw_text: str, valid_item_names: Set[str]) -> List[Tuple[str, int, bool]]:
-    lines = [_clean_line(l) for l in raw_text.splitlines()]
-    lines = [l for l in lines if l]
-
-    results: List[Tuple[str, int, bool]] = []
-    current_name: Optional[str] = None
-    current_qty: int = 1
-    current_omitted: bool = False
-
-    def flush() -> None:
-        nonlocal current_name, current_qty, current_omitted
-        if current_name is not None:
-            results.append((current_name, current_qty, current_omitted))
-        current_name = None
-        current_qty = 1
-        current_omitted = False
-
-    for line in lines:
-        if line in valid_item_names:
-            flush()
-            current_name = line
-            current_qty = 1
-            current_omitted = False
-            continue
+        if line in self.valid_item_names:
+            return self._start(line, 1)
 
         m_same = _NAME_QTY_SAME_LINE_RE.match(line)
         if m_same:
             possible_name = m_same.group(1).strip()
-            if possible_name in valid_item_names:
-                flush()
-                current_name = possible_name
-                current_qty = int(m_same.group(2))
-                current_omitted = False
-                continue
-
-        if current_name is None:
-            continue
+            if possible_name in self.valid_item_names:
+                return self._start(possible_name, int(m_same.group(2)))
 
         low = line.lower()
         if low == "equipped" or low == "untradable":
-            current_omitted = True
-            continue
+            if self.current_name is not None:
+                self.current_omitted = True
+            return None
 
         m_qty = _QTY_LINE_RE.match(line)
         if m_qty:
-            current_qty = int(m_qty.group(1))
-            continue
-
-    flush()
-    return results
-
-
-def match_inventory(raw_text: str, dict_csv_path: str | Path) -> ParseResult:
-    name_to_id = load_dictionary(dict_csv_path)
-    valid_names = set(name_to_id.keys())
+            if self.current_name is not None:
+                self.current_qty = int(m_qty.group(1))
+            return None
 
-    parsed = parse_add_listings_text(raw_text, valid_names)
+        if self.resolve is not None:
+            resolved = self.resolve(m_same.group(1).strip() if m_same else line)
+            if resolved is not None:
+                return self._start(resolved, int(m_same.group(2)) if m_same else 1)
+        return None
+
+
+def iter_add_listings(
+    source: str | Iterable[str] | TextIO,
+    valid_item_names: Set[str],
+    resolve: Optional[Callable[[str], Optional[str]]] = None,
+    chunk_size: int = 1 << 16,
+) -> Iterator[Tuple[str, int, bool]]:
+    # source is a whole text, a file-like object (read in chunk_size pieces) or
+    # any iterable of text chunks.
+    parser = AddListingsParser(valid_item_names, resolve)
+    if isinstance(source, str):
+        chunks: Iterable[str] = (source,)
+    elif hasattr(source, "read"):
+        chunks = iter(lambda: source.read(chunk_size), "")
+    else:
+        chunks = source
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+    yield from parser.close()
+
+
+def parse_add_listings_text(
+    raw_text: str,
+    valid_item_names: Set[str],
+    resolve: Optional[Callable[[str], Optional[str]]] = None,
+) -> List[Tuple[str, int, bool]]:
+    return list(iter_add_listings(raw_text, valid_item_names, resolve))
+
+
+def match_inventory(
+    raw_text: str | Iterable[str] | TextIO,
+    dict_csv_path: str | Path,
+    registry: DictionaryRegistry = DICTIONARY_REGISTRY,
+    fuzzy_threshold: Optional[float] = FUZZY_MATCH_THRESHOLD,
+) -> ParseResult:
+    dictionary = registry.get(dict_csv_path)
+    name_to_id = dictionary.name_to_id
+
+    # One lookup per distinct line: pastes repeat the same UI text many times.
+    # The normalized-key index is an O(1) second chance for case, quote,
+    # punctuation and spacing variants; only what it misses is fuzzy-matched.
+    resolved: Dict[str, Optional[str]] = {}
+    fuzzy_hits: Dict[str, Tuple[str, float]] = {}
+
+    def resolve(text: str) -> Optional[str]:
+        if text in resolved:
+            return resolved[text]
+        if len(resolved) >= _RESOLVE_MEMO_MAX:
+            resolved.clear()
+        # Every item name has a letter; prices and counts stop here.
+        if not any(c.isalpha() for c in text):
+            resolved[text] = None
+            return None
+        name = dictionary.lookup_normalized(text)
+        if name is None and fuzzy_threshold is not None and len(text) >= 3:
+            hit = dictionary.fuzzy.best_match(text, fuzzy_threshold)
+            if hit is not None:
+                fuzzy_hits[text] = hit
+                name = hit[0]
+        resolved[text] = name
+        return name
+
+    # Blocks are aggregated as the parser closes them, so a file-like source
+    # is never held in memory as a whole.
+    parsed = iter_add_listings(raw_text, dictionary.valid_names, resolve=resolve)
 
     aggregated: Dict[int, Tuple[str, int]] = {}
     unmatched: List[Tuple[str, int]] = []
@@ -148,7 +198,12 @@ def match_inventory(raw_text: str, dict_csv_path: str | Path) -> ParseResult:
         else:
             aggregated[item_id] = (name, qty)
 
-    matched = [MatchedItem(name=n, item_id=i, qty=q) for i, (n, q) in aggregated.items()]
+    scores: Dict[str, float] = {}
+    for name, score in fuzzy_hits.values():
+        scores[name] = min(scores.get(name, 100.0), score)
+    fuzzy = sorted((text, name, score) for text, (name, score) in fuzzy_hits.items())
+
+    matched = [MatchedItem(name=n, item_id=i, qty=q, score=scores.get(n, 100.0)) for i, (n, q) in aggregated.items()]
     matched.sort(key=lambda x: x.name)
 
-    return ParseResult(matched=matched, unmatched=unmatched)
+    return ParseResult(matched=matched, unmatched=unmatched, fuzzy=fuzzy)
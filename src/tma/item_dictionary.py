@@ -0,0 +1,250 @@
+from __future__ import annotations
+
+import argparse
+import csv
+import mmap
+import os
+import struct
+import sys
+import threading
+import zipfile
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+import numpy as np
+
+from .fuzzy_index import NGramIndex, normalize_key
+
+ROOT_DIR = Path(__file__).resolve().parents[2]
+DICT_PATH = ROOT_DIR / "data" / "torn_item_dictionary.csv"
+
+# Bump whenever the arrays stored in the compiled blob change; older blobs are
+# then rebuilt from the CSV on first load.
+BLOB_FORMAT_VERSION = 3
+_NAME_SEP = "\0"
+
+
+@dataclass(frozen=True)
+class ItemDictionary:
+    name_to_id: Dict[str, int]
+    valid_names: FrozenSet[str]
+    # normalize_key(name) -> name, for keys that only one name produces.
+    normalized: Dict[str, str] = field(repr=False)
+    fuzzy: NGramIndex = field(compare=False, repr=False)
+
+    @classmethod
+    def from_mapping(cls, name_to_id: Dict[str, int]) -> "ItemDictionary":
+        names = list(name_to_id)
+        return cls(
+            name_to_id=name_to_id,
+            valid_names=frozenset(names),
+            normalized=_normalized_index(names, [normalize_key(n) for n in names]),
+            fuzzy=NGramIndex.build(names),
+        )
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray]) -> "ItemDictionary":
+        names = arrays["names"].tobytes().decode("utf-8").split(_NAME_SEP)
+        keys = arrays["keys"].tobytes().decode("utf-8").split(_NAME_SEP)
+        return cls(
+            name_to_id=dict(zip(names, arrays["ids"].tolist())),
+            valid_names=frozenset(names),
+            normalized=_normalized_index(names, keys),
+            fuzzy=NGramIndex.from_arrays(names, arrays),
+        )
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        names = _NAME_SEP.join(self.name_to_id).encode("utf-8")
+        keys = _NAME_SEP.join(normalize_key(n) for n in self.name_to_id).encode("utf-8")
+        return {
+            "names": np.frombuffer(names, dtype=np.uint8),
+            "ids": np.fromiter(self.name_to_id.values(), dtype=np.int64, count=len(self.name_to_id)),
+            "keys": np.frombuffer(keys, dtype=np.uint8),
+            **self.fuzzy.to_arrays(),
+        }
+
+    def lookup_normalized(self, text: str) -> Optional[str]:
+        return self.normalized.get(normalize_key(text))
+
+
+def _normalized_index(names: List[str], keys: List[str]) -> Dict[str, str]:
+    # Keys shared by several names are left out: they can't be resolved
+    # without guessing, so those lines go on to fuzzy matching.
+    index: Dict[str, str] = {}
+    ambiguous = set()
+    for name, key in zip(names, keys):
+        if key in index and index[key] != name:
+            ambiguous.add(key)
+        index[key] = name
+    for key in ambiguous:
+        del index[key]
+    index.pop("", None)
+    return index
+
+
+def load_dictionary(dict_csv_path: str | Path) -> Dict[str, int]:
+    path = Path(dict_csv_path)
+    if not path.exists():
+        raise FileNotFoundError(f"Dictionary CSV not found: {path}")
+
+    with path.open("r", encoding="utf-8-sig", newline="") as f:
+        reader = csv.DictReader(f)
+        if not reader.fieldnames:
+            raise ValueError("Dictionary CSV has no header row.")
+
+        headers = {h.strip().lower(): h for h in reader.fieldnames}
+
+        def pick(*candidates: str) -> Optional[str]:
+            for c in candidates:
+                if c in headers:
+                    return headers[c]
+            return None
+
+        name_col = pick("key", "name", "item_name", "item", "title")
+        id_col = pick("id", "item_id", "itemid")
+
+        if not name_col or not id_col:
+            raise ValueError(
+                "Dictionary CSV must contain a name column (key/name/item_name/...) "
+                "and an id column (id/item_id/itemid)."
+            )
+
+        mapping: Dict[str, int] = {}
+        for row in reader:
+            name = (row.get(name_col) or "").strip()
+            raw_id = (row.get(id_col) or "").strip()
+            if not name or not raw_id:
+                continue
+            try:
+                mapping[name] = int(raw_id)
+            except ValueError:
+                continue
+
+    if not mapping:
+        raise ValueError("Dictionary CSV loaded but produced an empty mapping (no valid rows).")
+
+    return mapping
+
+
+def blob_path_for(dict_csv_path: str | Path) -> Path:
+    return Path(dict_csv_path).with_suffix(".npz")
+
+
+def _source_signature(path: Path) -> Tuple[int, int]:
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Dictionary CSV not found: {path}") from None
+    return st.st_mtime_ns, st.st_size
+
+
+def write_dictionary_blob(dictionary: ItemDictionary, blob_path: str | Path, source: Tuple[int, int]) -> Path:
+    # Uncompressed .npz (stored members), so read_dictionary_blob can map the
+    # arrays in place. Written to a temporary file and renamed into place.
+    blob_path = Path(blob_path)
+    tmp = blob_path.with_name(f"{blob_path.name}.{os.getpid()}.tmp")
+    arrays = dictionary.to_arrays()
+    arrays["format_version"] = np.array([BLOB_FORMAT_VERSION], dtype=np.int64)
+    arrays["source"] = np.array(source, dtype=np.int64)
+    with tmp.open("wb") as f:
+        np.savez(f, **arrays)
+    tmp.replace(blob_path)
+    return blob_path
+
+
+def read_dictionary_blob(blob_path: str | Path) -> Dict[str, np.ndarray]:
+    # np.load ignores mmap_mode for .npz, so the stored members are located in
+    # the zip and each array is a read-only view over one shared mapping.
+    with open(blob_path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        with zipfile.ZipFile(f) as zf:
+            infos = zf.infolist()
+
+        arrays: Dict[str, np.ndarray] = {}
+        for info in infos:
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError(f"{blob_path}: member {info.filename} is compressed")
+            name_len, extra_len = struct.unpack("<HH", mm[info.header_offset + 26 : info.header_offset + 30])
+            f.seek(info.header_offset + 30 + name_len + extra_len)
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            if fortran_order or dtype.hasobject:
+                raise ValueError(f"{blob_path}: member {info.filename} cannot be mapped")
+            count = int(np.prod(shape))
+            arrays[info.filename.removesuffix(".npy")] = np.frombuffer(mm, dtype=dtype, count=count, offset=f.tell()).reshape(shape)
+    return arrays
+
+
+def load_item_dictionary(dict_csv_path: str | Path, blob_path: str | Path | None = None) -> ItemDictionary:
+    # Prefers the compiled blob next to the CSV. A missing, unreadable, outdated
+    # or stale blob (CSV changed since it was built) is rebuilt from the CSV.
+    csv_path = Path(dict_csv_path)
+    blob_path = Path(blob_path) if blob_path is not None else blob_path_for(csv_path)
+    source = _source_signature(csv_path)
+
+    try:
+        arrays = read_dictionary_blob(blob_path)
+        if int(arrays["format_version"][0]) == BLOB_FORMAT_VERSION and tuple(arrays["source"].tolist()) == source:
+            return ItemDictionary.from_arrays(arrays)
+    except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+        pass
+
+    dictionary = ItemDictionary.from_mapping(load_dictionary(csv_path))
+    try:
+        write_dictionary_blob(dictionary, blob_path, source)
+    except OSError:
+        # Read-only deployments keep working from the CSV.
+        pass
+    return dictionary
+
+
+class DictionaryRegistry:
+    # Loaded dictionaries keyed by resolved path. An entry is reused until the
+    # file's mtime or size changes, so each process loads the dictionary once.
+    def __init__(self) -> None:
+        self.entries: Dict[Path, Tuple[Tuple[int, int], ItemDictionary]] = {}
+        self.lock = threading.Lock()
+
+    def get(self, dict_csv_path: str | Path) -> ItemDictionary:
+        path = Path(dict_csv_path).resolve()
+        signature = _source_signature(path)
+
+        with self.lock:
+            entry = self.entries.get(path)
+            if entry is not None and entry[0] == signature:
+                return entry[1]
+
+        # Loaded outside the lock; concurrent first loads just race to store
+        # identical results.
+        dictionary = load_item_dictionary(path)
+        with self.lock:
+            self.entries[path] = (signature, dictionary)
+        return dictionary
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+
+
+DICTIONARY_REGISTRY = DictionaryRegistry()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Compile the item dictionary CSV into its binary blob.")
+    parser.add_argument("--dict", type=Path, default=DICT_PATH)
+    parser.add_argument("--out", type=Path, default=None)
+    args = parser.parse_args(argv)
+
+    out = args.out or blob_path_for(args.dict)
+    dictionary = ItemDictionary.from_mapping(load_dictionary(args.dict))
+    write_dictionary_blob(dictionary, out, _source_signature(args.dict))
+    print(f"Wrote {len(dictionary.name_to_id)} items to {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
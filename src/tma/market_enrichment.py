@@ -1,6 +1,9 @@
 from __future__ import annotations
 
-import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable
+
 import numpy as np
 import pandas as pd
 
@@ -11,118 +14,242 @@ EXCLUSIVE_TOTAL_UNITS_THRESHOLD = 200.0
 EXCLUSIVE_DOMINANCE_SHARE = 0.50
 EXCLUSIVE_HIGH_FACTOR = 10.0
 
+PARALLEL_MIN_ROWS = 500_000
+PARALLEL_ROWS_PER_WORKER = 250_000
 
-def wide_to_long(df: pd.DataFrame) -> pd.DataFrame:
-    price_cols = sorted([c for c in df.columns if c.startswith("price_")], key=lambda x: int(x.split("_")[1]))
-    amount_cols = sorted([c for c in df.columns if c.startswith("amount_")], key=lambda x: int(x.split("_")[1]))
-
-    records: list[dict] = []
-    for _, row in df.iterrows():
-        base = {
-            "item_id": row.get("item_id"),
-            "item_name": row.get("item_name", None),
-            "item_type": row.get("item_type", None),
-            "average_price": row.get("average_price", None),
-            "my_quantity": row.get("my_quantity", None),
-        }
+BOOK_META_COLUMNS = ["item_id", "item_name", "item_type", "average_price", "my_quantity"]
+LONG_COLUMNS = BOOK_META_COLUMNS + ["listing_rank", "price", "quantity"]
 
-        for idx, (p_col, q_col) in enumerate(zip(price_cols, amount_cols), start=1):
-            price = row.get(p_col)
-            qty = row.get(q_col)
+# Padding for int64 price matrices: sorts after every real price.
+PRICE_PAD = np.iinfo(np.int64).max
 
-            if pd.isna(price) or pd.isna(qty):
-                continue
 
-            try:
-                price = float(price)
-                qty = float(qty)
-            except (TypeError, ValueError):
-                continue
-
-            if qty <= 0:
-                continue
+def wide_to_long(df: pd.DataFrame) -> pd.DataFrame:
+    price_cols = sorted([c for c in df.columns if c.startswith("price_")], key=lambda x: int(x.split("_")[1]))
+    amount_cols = sorted([c for c in df.columns if c.startswith("amount_")], key=lambda x: int(x.split("_")[1]))
 
-            rec = dict(base)
-            rec["listing_rank"] = idx
-            rec["price"] = price
-            rec["quantity"] = qty
-            records.append(rec)
+    n_levels = min(len(price_cols), len(amount_cols))
+    if df.empty or n_levels == 0:
+        return pd.DataFrame(columns=LONG_COLUMNS)
 
-    cols = [
-        "item_id",
-        "item_name",
-        "item_type",
-        "average_price",
-        "my_quantity",
-        "listing_rank",
-        "price",
-        "quantity",
-    ]
+    def block(cols: list[str]) -> np.ndarray:
+        sub = df[cols]
+        if not all(pd.api.types.is_numeric_dtype(t) for t in sub.dtypes):
+            sub = sub.apply(pd.to_numeric, errors="coerce")
+        return sub.to_numpy(dtype=float, na_value=np.nan)
 
-    if not records:
-        return pd.DataFrame(columns=cols)
+    # (n_items, n_levels) blocks; np.nonzero walks them row-major, which keeps
+    # the per-item, per-rank order of the original row-by-row loop.
+    prices = block(price_cols[:n_levels])
+    amounts = block(amount_cols[:n_levels])
 
-    out = pd.DataFrame.from_records(records)
-    return out[cols]
+    with np.errstate(invalid="ignore"):
+        mask = ~np.isnan(prices) & (amounts > 0)
+    row_idx, level_idx = np.nonzero(mask)
 
+    if row_idx.size == 0:
+        return pd.DataFrame(columns=LONG_COLUMNS)
 
-def _weighted_quantile(values: np.ndarray, weights: np.ndarray, q: float) -> float:
+    columns: dict[str, object] = {}
+    for c in BOOK_META_COLUMNS:
+        if c in df.columns:
+            columns[c] = df[c].to_numpy()[row_idx]
+        else:
+            columns[c] = np.full(row_idx.size, None, dtype=object)
+    columns["listing_rank"] = (level_idx + 1).astype(np.int64)
+    columns["price"] = prices[mask].astype(np.int64)
+    columns["quantity"] = amounts[mask].astype(np.int64)
+
+    return pd.DataFrame(columns, columns=LONG_COLUMNS)
+
+
+def books_to_long(books: Iterable[dict]) -> pd.DataFrame:
+    # Books come from the fetch layer as per-item int64 price/amount arrays; they
+    # are concatenated straight into the long frame without a wide intermediate.
+    books = [b for b in books if "error" not in b and "price" in b]
+    if not books:
+        return pd.DataFrame(columns=LONG_COLUMNS)
+
+    counts = np.fromiter((len(b["price"]) for b in books), dtype=np.int64, count=len(books))
+    total = int(counts.sum())
+    if total == 0:
+        return pd.DataFrame(columns=LONG_COLUMNS)
+
+    starts = np.cumsum(counts) - counts
+    price = np.concatenate([np.asarray(b["price"]) for b in books])
+    quantity = np.concatenate([np.asarray(b["amount"]) for b in books])
+    listing_rank = np.arange(total, dtype=np.int64) - np.repeat(starts, counts) + 1
+
+    meta = pd.DataFrame([{c: b.get(c) for c in BOOK_META_COLUMNS} for b in books])
+    for c in ("item_id", "average_price", "my_quantity"):
+        meta[c] = pd.to_numeric(meta[c], errors="coerce")
+
+    columns: dict[str, object] = {c: np.repeat(meta[c].to_numpy(), counts) for c in BOOK_META_COLUMNS}
+    columns["listing_rank"] = listing_rank
+    columns["price"] = price.astype(np.int64, copy=False)
+    columns["quantity"] = quantity.astype(np.int64, copy=False)
+
+    keep = quantity > 0
+    if not keep.all():
+        columns = {c: np.asarray(v)[keep] for c, v in columns.items()}
+
+    return pd.DataFrame(columns, columns=LONG_COLUMNS)
+
+
+def books_to_wide(books: Iterable[dict]) -> pd.DataFrame:
+    # The legacy one-row-per-item price_i/amount_i layout, kept only for display.
+    books = list(books)
+    depth = max([100] + [len(b["price"]) for b in books if "price" in b])
+
+    prices = np.full((len(books), depth), np.nan)
+    amounts = np.full((len(books), depth), np.nan)
+    for i, b in enumerate(books):
+        if "price" not in b:
+            continue
+        n = min(len(b["price"]), depth)
+        prices[i, :n] = b["price"][:n]
+        amounts[i, :n] = b["amount"][:n]
+
+    interleaved = np.empty((len(books), 2 * depth))
+    interleaved[:, 0::2] = prices
+    interleaved[:, 1::2] = amounts
+    listing_cols = [f"{kind}_{i}" for i in range(1, depth + 1) for kind in ("price", "amount")]
+
+    meta = pd.DataFrame([{c: b.get(c) for c in BOOK_META_COLUMNS} for b in books], columns=BOOK_META_COLUMNS)
+    for c in ("item_id", "average_price", "my_quantity"):
+        meta[c] = pd.to_numeric(meta[c], errors="coerce")
+
+    out = pd.concat([meta, pd.DataFrame(interleaved, columns=listing_cols)], axis=1)
+    if any("error" in b for b in books):
+        out["error"] = [b.get("error") for b in books]
+    return out
+
+
+def weighted_quantiles(values: np.ndarray, weights: np.ndarray | None, qs) -> np.ndarray:
+    # Sorts once and answers every level in qs. Weighted: the first value whose
+    # cumulative weight reaches q * total (q <= 0 / q >= 1 give min / max).
+    # weights=None, or a non-positive total, means np.quantile's linear method.
+    # Weighted answers are elements of values, so integer input stays integer.
+    values = np.asarray(values)
+    qs = np.atleast_1d(np.asarray(qs, dtype=float))
     if values.size == 0:
-        return float("nan")
+        return np.full(qs.shape, np.nan)
+    if weights is None:
+        return np.quantile(values, qs)
 
-    q = float(q)
-    if q <= 0:
-        return float(np.min(values))
-    if q >= 1:
-        return float(np.max(values))
-
-    order = np.argsort(values)
+    order = np.argsort(values, kind="stable")
     v = values[order]
-    w = weights[order].astype(float)
+    w = np.asarray(weights, dtype=float)[order]
 
     total = float(np.sum(w))
     if total <= 0:
-        return float(np.quantile(v, q))
+        return np.quantile(v, qs)
 
     cum = np.cumsum(w)
-    target = q * total
-    return float(v[cum >= target][0])
-
-
-def _weighted_median(values: np.ndarray, weights: np.ndarray) -> float:
-    return _weighted_quantile(values, weights, 0.5)
+    idx = np.minimum(np.searchsorted(cum, qs * total, side="left"), v.size - 1)
+    out = v[idx]
+    out = np.where(qs <= 0, v[0], out)
+    return np.where(qs >= 1, v[-1], out)
+
+
+def _segment_layout(keys: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    # keys must already be grouped (sorted). Returns each segment's start and
+    # length plus, per row, its segment number and position inside the segment.
+    n = keys.size
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]]) if n else np.empty(0, dtype=np.int64)
+    counts = np.diff(np.r_[starts, n])
+    seg = np.repeat(np.arange(starts.size), counts)
+    pos = np.arange(n) - np.repeat(starts, counts)
+    return starts, counts, seg, pos
+
+
+def _padded(values: np.ndarray, seg: np.ndarray, pos: np.ndarray, shape: tuple[int, int], fill) -> np.ndarray:
+    out = np.full(shape, fill, dtype=values.dtype)
+    out[seg, pos] = values
+    return out
+
+
+def _padded_weighted_quantiles(
+    sorted_values: np.ndarray,
+    cum_weights: np.ndarray,
+    totals: np.ndarray,
+    qs,
+) -> np.ndarray:
+    # One row per segment, values ascending and weights cumulated along axis 1
+    # (padding repeats the row total). Returns (n_segments, len(qs)).
+    rows = np.arange(sorted_values.shape[0])
+    out = np.empty((sorted_values.shape[0], len(qs)), dtype=sorted_values.dtype)
+    for j, q in enumerate(qs):
+        idx = np.argmax(cum_weights >= (q * totals)[:, None], axis=1)
+        out[:, j] = sorted_values[rows, idx]
+    return out
+
+
+def _padded_linear_quantiles(sorted_values: np.ndarray, counts: np.ndarray, qs) -> np.ndarray:
+    # np.quantile's default "linear" method applied row-wise to the first counts[i]
+    # entries of each row, including its lerp formulation, so results are identical.
+    rows = np.arange(sorted_values.shape[0])
+    out = np.empty((sorted_values.shape[0], len(qs)))
+    for j, q in enumerate(qs):
+        virtual = (counts - 1) * q
+        lo = np.floor(virtual).astype(np.int64)
+        hi = lo + 1
+        at_end = virtual >= counts - 1
+        lo[at_end] = counts[at_end] - 1
+        hi[at_end] = counts[at_end] - 1
+        gamma = virtual - lo
+
+        a = sorted_values[rows, lo]
+        b = sorted_values[rows, hi]
+        diff = b - a
+        out[:, j] = np.where(gamma >= 0.5, b - diff * (1 - gamma), a + diff * gamma)
+    return out
+
+
+def weighted_quantiles_by_segment(
+    values: np.ndarray,
+    weights: np.ndarray | None,
+    segments: np.ndarray,
+    qs,
+) -> tuple[np.ndarray, np.ndarray]:
+    # Batched weighted_quantiles: one sort for all segments, one row of answers
+    # per distinct segment key (returned in ascending key order).
+    values = np.asarray(values, dtype=float)
+    segments = np.asarray(segments)
+    qs = np.atleast_1d(np.asarray(qs, dtype=float))
+    if values.size == 0:
+        return segments[:0], np.empty((0, qs.size))
 
+    order = np.lexsort((values, segments))
+    keys = segments[order]
+    starts, counts, seg, pos = _segment_layout(keys)
+    shape = (starts.size, int(counts.max()))
+    sorted_mat = _padded(values[order], seg, pos, shape, np.inf)
 
-def _weighted_price_quantile(df: pd.DataFrame, q: float) -> float:
-    if df.empty:
-        return float("nan")
-    d = df.sort_values("price")
-    return _weighted_quantile(d["price"].to_numpy(dtype=float), d["quantity"].to_numpy(dtype=float), q)
+    linear = _padded_linear_quantiles(sorted_mat, counts, qs)
+    if weights is None:
+        return keys[starts], linear
 
-
-def _unweighted_price_quantile(df: pd.DataFrame, q: float) -> float:
-    if df.empty:
-        return float("nan")
-    return float(np.quantile(df["price"].to_numpy(dtype=float), q))
+    cum_mat = np.cumsum(_padded(np.asarray(weights, dtype=float)[order], seg, pos, shape, 0.0), axis=1)
+    totals = cum_mat[:, -1]
+    out = _padded_weighted_quantiles(sorted_mat, cum_mat, totals, qs)
+    out[:, qs <= 0] = sorted_mat[:, :1]
+    out[:, qs >= 1] = sorted_mat[np.arange(starts.size), counts - 1][:, None]
+    out[totals <= 0] = linear[totals <= 0]
+    return keys[starts], out
 
 
 def add_price_stats_for_item(df_item: pd.DataFrame) -> pd.DataFrame:
     df_item = df_item.copy()
 
-    prices = df_item["price"].to_numpy(dtype=float)
-    qty = df_item["quantity"].to_numpy(dtype=float)
+    prices = df_item["price"].to_numpy(dtype=np.int64)
+    qty = df_item["quantity"].to_numpy(dtype=np.int64)
 
-    total_w = float(np.sum(qty))
-    if total_w <= 0:
-        median = float(np.median(prices))
-        q1 = float(np.quantile(prices, 0.25))
-        q3 = float(np.quantile(prices, 0.75))
-        mad = float(np.median(np.abs(prices - median)))
-    else:
-        median = _weighted_median(prices, qty)
-        q1 = _weighted_quantile(prices, qty, 0.25)
-        q3 = _weighted_quantile(prices, qty, 0.75)
-        mad = _weighted_median(np.abs(prices - median), qty)
+    # A book without positive quantity counts every listing once, so the
+    # statistics are still listed prices.
+    weights = qty if qty.sum() > 0 else np.ones_like(qty)
+    median, q1, q3 = (int(v) for v in weighted_quantiles(prices, weights, (0.5, 0.25, 0.75)))
+    mad = int(weighted_quantiles(np.abs(prices - median), weights, (0.5,))[0])
 
     df_item["price_median"] = median
     df_item["price_q1"] = q1
@@ -186,7 +313,7 @@ def mark_suspected_anchors_for_item(
     return df_item
 
 
-def enrich_item_orders(df_item: pd.DataFrame) -> pd.DataFrame:
+def enrich_item_orders_staged(df_item: pd.DataFrame) -> pd.DataFrame:
     df_item = add_price_stats_for_item(df_item)
     df_item = add_depth_features_for_item(df_item)
     df_item = mark_suspected_anchors_for_item(df_item)
@@ -233,14 +360,13 @@ def compute_price_suggestions_for_item(df_item: pd.DataFrame) -> dict:
 
     exclusive_mode = (total_qty_clean <= EXCLUSIVE_TOTAL_UNITS_THRESHOLD) or (max_level_share_clean >= EXCLUSIVE_DOMINANCE_SHARE)
 
-    if exclusive_mode:
-        fair_price = _unweighted_price_quantile(df_clean, 0.5)
-        q1_price = _unweighted_price_quantile(df_clean, 0.25)
-        q3_price = _unweighted_price_quantile(df_clean, 0.75)
-    else:
-        fair_price = _weighted_price_quantile(df_clean, 0.5)
-        q1_price = _weighted_price_quantile(df_clean, 0.25)
-        q3_price = _weighted_price_quantile(df_clean, 0.75)
+    clean_prices = df_clean["price"].to_numpy(dtype=np.int64)
+    clean_weights = None if exclusive_mode else df_clean["quantity"].to_numpy(dtype=np.int64)
+    # Unweighted (exclusive) quantiles interpolate between listings; they are
+    # rounded half-to-even back to whole dollars.
+    fair_price, q1_price, q3_price = (
+        int(np.rint(v)) for v in weighted_quantiles(clean_prices, clean_weights, (0.5, 0.25, 0.75))
+    )
 
     df_clean_sorted = df_clean.sort_values("price").copy()
     df_clean_sorted["cum_qty_clean"] = df_clean_sorted["quantity"].cumsum()
@@ -249,24 +375,18 @@ def compute_price_suggestions_for_item(df_item: pd.DataFrame) -> dict:
 
     if exclusive_mode:
         idx = min(2, len(df_clean_sorted) - 1)
-        fast_sell_raw = float(df_clean_sorted.iloc[idx]["price"])
+        fast_sell_raw = int(df_clean_sorted["price"].iloc[idx])
     else:
         if avg_qty_per_listing <= 2.0:
             target_listings = min(FAST_SELL_LISTINGS_THRESHOLD, len(df_clean_sorted))
-            fast_sell_raw = float(df_clean_sorted.iloc[target_listings - 1]["price"])
+            fast_sell_raw = int(df_clean_sorted["price"].iloc[target_listings - 1])
         else:
             target_units = min(FAST_SELL_UNITS_THRESHOLD, total_qty_clean)
             mask = df_clean_sorted["cum_qty_clean"] >= target_units
-            fast_sell_raw = float(df_clean_sorted.loc[mask, "price"].iloc[0]) if mask.any() else float(df_clean_sorted["price"].iloc[-1])
+            fast_sell_raw = int(df_clean_sorted.loc[mask, "price"].iloc[0]) if mask.any() else int(df_clean_sorted["price"].iloc[-1])
 
-    if np.isfinite(fast_sell_raw):
-        base_price = float(round(fast_sell_raw))
-        if is_bulk_mode:
-            fast_sell_price = max(math.floor(base_price) - 1, 0.0)
-        else:
-            fast_sell_price = max(base_price, 0.0)
-    else:
-        fast_sell_price = float("nan")
+    # Listed prices are whole dollars, so the bulk undercut is exact.
+    fast_sell_price = max(fast_sell_raw - 1, 0) if is_bulk_mode else max(fast_sell_raw, 0)
 
     num_listings = int(len(df_item))
     num_suspected_anchors = int(df_item["is_suspected_anchor"].sum()) if "is_suspected_anchor" in df_item.columns else 0
@@ -279,36 +399,352 @@ def compute_price_suggestions_for_item(df_item: pd.DataFrame) -> dict:
         "my_quantity": my_quantity,
         "num_listings": num_listings,
         "num_suspected_anchors": num_suspected_anchors,
-        "fast_sell_price": float(fast_sell_price),
-        "fair_price": float(fair_price),
-        "greedy_price": float(q3_price),
-        "clean_median_price": float(fair_price),
-        "clean_q1_price": float(q1_price),
-        "clean_q3_price": float(q3_price),
+        "fast_sell_price": fast_sell_price,
+        "fair_price": fair_price,
+        "greedy_price": q3_price,
+        "clean_median_price": fair_price,
+        "clean_q1_price": q1_price,
+        "clean_q3_price": q3_price,
     }
 
 
-def enrich_all_items(long_df: pd.DataFrame) -> pd.DataFrame:
-    required = {
-        "item_id",
-        "item_name",
-        "item_type",
-        "average_price",
-        "my_quantity",
-        "listing_rank",
-        "price",
-        "quantity",
+ENRICHED_FEATURE_COLUMNS = [
+    "price_median",
+    "price_q1",
+    "price_q3",
+    "price_iqr",
+    "price_mad",
+    "robust_z",
+    "is_extreme_price",
+    "cum_qty",
+    "cum_qty_pct",
+    "level_share",
+    "is_suspected_anchor",
+]
+
+
+def _pool_size(n_rows: int, workers: int | None) -> int:
+    # workers=None picks automatically: serial below PARALLEL_MIN_ROWS, where
+    # process start-up costs more than the enrichment itself.
+    if workers is not None:
+        return max(1, int(workers))
+    if n_rows < PARALLEL_MIN_ROWS:
+        return 1
+    return max(1, min(os.cpu_count() or 1, n_rows // PARALLEL_ROWS_PER_WORKER))
+
+
+def _item_chunks(item_ids: np.ndarray, n_chunks: int) -> list[np.ndarray]:
+    # Row indices for n_chunks contiguous item-id ranges holding roughly equal
+    # numbers of listings. Whole items always stay in one chunk.
+    unique_ids, inverse, counts = np.unique(item_ids, return_inverse=True, return_counts=True)
+    inverse = inverse.reshape(-1)
+    cum = np.cumsum(counts)
+    cuts = np.searchsorted(cum, cum[-1] * np.arange(1, n_chunks) / n_chunks, side="left")
+    chunk_of_item = np.searchsorted(cuts, np.arange(unique_ids.size), side="right")
+    row_chunk = chunk_of_item[inverse]
+    rows = np.argsort(row_chunk, kind="stable")
+    bounds = np.cumsum(np.bincount(row_chunk, minlength=n_chunks))[:-1]
+    return [c for c in np.split(rows, bounds) if c.size]
+
+
+def _enrich_arrays(
+    item_ids: np.ndarray,
+    price: np.ndarray,
+    qty: np.ndarray,
+    listing_rank: np.ndarray,
+    z_threshold: float = 5.0,
+    front_depth_pct: float = 0.02,
+    back_depth_pct: float = 0.02,
+    max_level_units_for_anchor: float = 50.0,
+) -> tuple[np.ndarray, dict[str, np.ndarray]]:
+    # Single sort by (item_id, price), ties kept in listing order; every per-item
+    # statistic is computed for all items at once on contiguous segments and
+    # written into one preallocated array per feature column. Returns the row
+    # order and the feature columns (already in that order).
+    order = np.lexsort((listing_rank, price, item_ids))
+    price = price[order]
+    qty = qty[order]
+    n = price.size
+    starts, counts, seg, pos = _segment_layout(item_ids[order])
+    n_seg = starts.size
+    shape = (n_seg, int(counts.max()))
+
+    features = {
+        "price_median": np.empty(n, dtype=np.int64),
+        "price_q1": np.empty(n, dtype=np.int64),
+        "price_q3": np.empty(n, dtype=np.int64),
+        "price_iqr": np.empty(n, dtype=np.int64),
+        "price_mad": np.empty(n, dtype=np.int64),
+        "robust_z": np.empty(n),
+        "is_extreme_price": np.empty(n, dtype=bool),
+        "cum_qty": np.empty(n, dtype=np.int64),
+        "cum_qty_pct": np.empty(n),
+        "level_share": np.empty(n),
+        "is_suspected_anchor": np.empty(n, dtype=bool),
     }
-    missing = required.difference(long_df.columns)
+
+    # Rows padded to the deepest book: cumsum along axis 1 adds each item's
+    # quantities in the same order as a per-item cumsum.
+    qty_mat = _padded(qty, seg, pos, shape, 0)
+    cum_mat = np.cumsum(qty_mat, axis=1)
+    totals = cum_mat[:, -1]
+    price_mat = _padded(price, seg, pos, shape, PRICE_PAD)
+
+    median, q1, q3 = _padded_weighted_quantiles(price_mat, cum_mat, totals, (0.5, 0.25, 0.75)).T.copy()
+
+    dev_mat = np.abs(price_mat - median[:, None])
+    dev_order = np.argsort(dev_mat, axis=1, kind="stable")
+    dev_sorted = np.take_along_axis(dev_mat, dev_order, axis=1)
+    dev_cum = np.cumsum(np.take_along_axis(qty_mat, dev_order, axis=1), axis=1)
+    mad = _padded_weighted_quantiles(dev_sorted, dev_cum, totals, (0.5,))[:, 0]
+    del qty_mat, price_mat, dev_mat, dev_order, dev_sorted, dev_cum
+
+    # Books without positive total quantity count every listing once, exactly
+    # like add_price_stats_for_item.
+    for s in np.flatnonzero(totals <= 0):
+        p = price[starts[s] : starts[s] + counts[s]]
+        ones = np.ones_like(p)
+        median[s], q1[s], q3[s] = weighted_quantiles(p, ones, (0.5, 0.25, 0.75))
+        mad[s] = weighted_quantiles(np.abs(p - median[s]), ones, (0.5,))[0]
+
+    median_r = np.take(median, seg, out=features["price_median"])
+    np.take(q1, seg, out=features["price_q1"])
+    np.take(q3, seg, out=features["price_q3"])
+    np.take(q3 - q1, seg, out=features["price_iqr"])
+    mad_r = np.take(mad, seg, out=features["price_mad"])
+
+    robust_z = features["robust_z"]
+    robust_z.fill(0.0)
+    has_mad = mad_r > 0
+    robust_z[has_mad] = 0.6745 * (price[has_mad] - median_r[has_mad]) / mad_r[has_mad]
+    np.greater(np.abs(robust_z), 3.0, out=features["is_extreme_price"])
+
+    cum_qty = features["cum_qty"]
+    cum_qty[:] = cum_mat[seg, pos]
+    del cum_mat
+    totals_r = totals[seg]
+    positive = totals_r > 0
+    cum_qty_pct = features["cum_qty_pct"]
+    cum_qty_pct.fill(0.0)
+    np.divide(cum_qty, totals_r, out=cum_qty_pct, where=positive)
+
+    level_starts = np.flatnonzero(np.r_[True, (seg[1:] != seg[:-1]) | (price[1:] != price[:-1])])
+    level_counts = np.diff(np.r_[level_starts, n])
+    level_qty = np.repeat(np.add.reduceat(qty, level_starts), level_counts)
+    level_share = features["level_share"]
+    level_share.fill(0.0)
+    np.divide(level_qty, totals_r, out=level_share, where=positive)
+
+    max_level_share = np.maximum.reduceat(level_share, starts)
+    exclusive = (totals <= EXCLUSIVE_TOTAL_UNITS_THRESHOLD) | (max_level_share >= EXCLUSIVE_DOMINANCE_SHARE)
+    exclusive_r = (exclusive & (median > 0))[seg]
+
+    shallow = (cum_qty_pct < front_depth_pct) | (cum_qty_pct > (1.0 - back_depth_pct))
+    exclusive_anchor = (price > median_r * EXCLUSIVE_HIGH_FACTOR) & (shallow | (qty <= max_level_units_for_anchor))
+    regular_anchor = (np.abs(robust_z) > z_threshold) & shallow & (qty < max_level_units_for_anchor)
+    np.copyto(features["is_suspected_anchor"], np.where(exclusive_r, exclusive_anchor, regular_anchor))
+
+    return order, features
+
+
+def enrich_item_orders(df_item: pd.DataFrame) -> pd.DataFrame:
+    # Same result as running the three *_for_item stages in sequence, but the
+    # features go straight into arrays and the frame is built once (no
+    # intermediate copies or level-table merge).
+    if df_item.empty:
+        extra = [c for c in ENRICHED_FEATURE_COLUMNS if c not in df_item.columns]
+        return pd.DataFrame(columns=list(df_item.columns) + extra)
+
+    n = len(df_item)
+    rank = df_item["listing_rank"].to_numpy() if "listing_rank" in df_item.columns else np.arange(n)
+    order, features = _enrich_arrays(
+        np.zeros(n, dtype=np.int64),
+        df_item["price"].to_numpy(dtype=np.int64),
+        df_item["quantity"].to_numpy(dtype=np.int64),
+        rank,
+    )
+    data = {c: df_item[c].to_numpy()[order] for c in df_item.columns}
+    data.update(features)
+    return pd.DataFrame(data)
+
+
+def enrich_all_items(
+    long_df: pd.DataFrame,
+    z_threshold: float = 5.0,
+    front_depth_pct: float = 0.02,
+    back_depth_pct: float = 0.02,
+    max_level_units_for_anchor: float = 50.0,
+    workers: int | None = None,
+) -> pd.DataFrame:
+    missing = set(LONG_COLUMNS).difference(long_df.columns)
     if missing:
         raise ValueError(f"Missing columns in long_df: {sorted(missing)}")
 
-    safe_df = long_df[list(required)].copy()
-    return safe_df.groupby("item_id", group_keys=False).apply(enrich_item_orders).reset_index(drop=True)
+    valid = long_df["item_id"].notna().to_numpy()
+    if not valid.any():
+        return pd.DataFrame(columns=LONG_COLUMNS + ENRICHED_FEATURE_COLUMNS)
+
+    def column(c: str) -> np.ndarray:
+        values = long_df[c].to_numpy()
+        return values if valid.all() else values[valid]
+
+    item_ids = column("item_id")
+    price = column("price").astype(np.int64, copy=False)
+    qty = column("quantity").astype(np.int64, copy=False)
+    rank = column("listing_rank")
+    params = {
+        "z_threshold": z_threshold,
+        "front_depth_pct": front_depth_pct,
+        "back_depth_pct": back_depth_pct,
+        "max_level_units_for_anchor": max_level_units_for_anchor,
+    }
 
+    n_workers = _pool_size(item_ids.size, workers)
+    if n_workers == 1:
+        order, features = _enrich_arrays(item_ids, price, qty, rank, **params)
+    else:
+        # Chunks are contiguous item-id ranges, so concatenating their results
+        # in chunk order reproduces the serial (item_id, price) ordering.
+        chunks = _item_chunks(item_ids, n_workers)
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            futures = [
+                pool.submit(_enrich_arrays, item_ids[idx], price[idx], qty[idx], rank[idx], **params)
+                for idx in chunks
+            ]
+            parts = [f.result() for f in futures]
+        order = np.concatenate([idx[p[0]] for idx, p in zip(chunks, parts)])
+        features = {c: np.concatenate([p[1][c] for p in parts]) for c in ENRICHED_FEATURE_COLUMNS}
+
+    data = {c: column(c)[order] for c in LONG_COLUMNS}
+    data.update(features)
+    return pd.DataFrame(data, copy=False)
+
+
+SUMMARY_COLUMNS = [
+    "item_id",
+    "item_name",
+    "item_type",
+    "average_price_reported",
+    "my_quantity",
+    "num_listings",
+    "num_suspected_anchors",
+    "fast_sell_price",
+    "fair_price",
+    "greedy_price",
+    "clean_median_price",
+    "clean_q1_price",
+    "clean_q3_price",
+]
+
+
+def _summary_arrays(
+    item_ids: np.ndarray,
+    price: np.ndarray,
+    qty: np.ndarray,
+    anchor: np.ndarray,
+) -> tuple[np.ndarray, np.ndarray, dict[str, np.ndarray]]:
+    # Per-item summary numbers for every item at once. Returns the sorted item
+    # ids, the index of each item's first row (for metadata) and the columns.
+    unique_ids, first_idx, item_seg, num_listings = np.unique(
+        item_ids, return_index=True, return_inverse=True, return_counts=True
+    )
+    item_seg = item_seg.reshape(-1)
+    n_items = unique_ids.size
+    num_anchors = np.bincount(item_seg, weights=anchor, minlength=n_items).astype(np.int64)
+
+    # Items whose listings are all flagged keep their full book, as in
+    # compute_price_suggestions_for_item.
+    keep = ~anchor | (num_anchors == num_listings)[item_seg]
+    order = np.lexsort((price[keep], item_seg[keep]))
+    c_seg = item_seg[keep][order]
+    c_price = price[keep][order]
+    c_qty = qty[keep][order]
+
+    starts, counts, seg, pos = _segment_layout(c_seg)
+    shape = (n_items, int(counts.max()))
+    qty_mat = _padded(c_qty, seg, pos, shape, 0)
+    cum_mat = np.cumsum(qty_mat, axis=1)
+    totals = cum_mat[:, -1]
+    price_mat = _padded(c_price, seg, pos, shape, PRICE_PAD)
+
+    level_starts = np.flatnonzero(np.r_[True, (seg[1:] != seg[:-1]) | (c_price[1:] != c_price[:-1])])
+    level_qty = np.add.reduceat(c_qty, level_starts)
+    max_level_qty = np.maximum.reduceat(level_qty, np.searchsorted(level_starts, starts))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        max_level_share = np.where(totals > 0, max_level_qty / totals, 0.0)
+    avg_qty_per_listing = totals / counts
+
+    exclusive = (totals <= EXCLUSIVE_TOTAL_UNITS_THRESHOLD) | (max_level_share >= EXCLUSIVE_DOMINANCE_SHARE)
+    is_bulk = ~exclusive & (avg_qty_per_listing > 2.0)
+
+    qs = (0.5, 0.25, 0.75)
+    # Linear (exclusive) quantiles are rounded half-to-even to whole dollars.
+    fair, q1, q3 = np.where(
+        exclusive[:, None],
+        np.rint(_padded_linear_quantiles(price_mat, counts, qs)).astype(np.int64),
+        _padded_weighted_quantiles(price_mat, cum_mat, totals, qs),
+    ).T
+
+    rows = np.arange(n_items)
+    exclusive_idx = np.minimum(2, counts - 1)
+    unit_idx = np.minimum(FAST_SELL_LISTINGS_THRESHOLD, counts) - 1
+    bulk_idx = np.argmax(cum_mat >= np.minimum(FAST_SELL_UNITS_THRESHOLD, totals)[:, None], axis=1)
+    fast_idx = np.where(exclusive, exclusive_idx, np.where(avg_qty_per_listing <= 2.0, unit_idx, bulk_idx))
+    fast_raw = price_mat[rows, fast_idx]
+    fast_sell = np.maximum(np.where(is_bulk, fast_raw - 1, fast_raw), 0)
+
+    return (
+        unique_ids,
+        first_idx,
+        {
+            "num_listings": num_listings.astype(np.int64),
+            "num_suspected_anchors": num_anchors,
+            "fast_sell_price": fast_sell,
+            "fair_price": fair,
+            "greedy_price": q3,
+            "clean_median_price": fair,
+            "clean_q1_price": q1,
+            "clean_q3_price": q3,
+        },
+    )
+
+
+def build_summary_from_enriched(enriched_df: pd.DataFrame, workers: int | None = None) -> pd.DataFrame:
+    df = enriched_df[enriched_df["item_id"].notna()]
+    if df.empty:
+        return pd.DataFrame(columns=SUMMARY_COLUMNS)
+
+    item_ids = df["item_id"].to_numpy()
+    price = df["price"].to_numpy(dtype=np.int64)
+    qty = df["quantity"].to_numpy(dtype=np.int64)
+    if "is_suspected_anchor" in df.columns:
+        anchor = df["is_suspected_anchor"].to_numpy(dtype=bool)
+    else:
+        anchor = np.zeros(len(df), dtype=bool)
 
-def build_summary_from_enriched(enriched_df: pd.DataFrame) -> pd.DataFrame:
-    summaries: list[dict] = []
-    for _, df_item in enriched_df.groupby("item_id"):
-        summaries.append(compute_price_suggestions_for_item(df_item))
-    return pd.DataFrame(summaries)
+    n_workers = _pool_size(len(df), workers)
+    if n_workers == 1:
+        unique_ids, first_idx, columns = _summary_arrays(item_ids, price, qty, anchor)
+    else:
+        chunks = _item_chunks(item_ids, n_workers)
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            futures = [pool.submit(_summary_arrays, item_ids[idx], price[idx], qty[idx], anchor[idx]) for idx in chunks]
+            parts = [f.result() for f in futures]
+        unique_ids = np.concatenate([p[0] for p in parts])
+        first_idx = np.concatenate([idx[p[1]] for idx, p in zip(chunks, parts)])
+        columns = {c: np.concatenate([p[2][c] for p in parts]) for c in parts[0][2]}
+
+    def first_of(col: str) -> object:
+        if col not in df.columns:
+            return None
+        return df[col].to_numpy()[first_idx]
+
+    data = {
+        "item_id": unique_ids.astype(np.int64),
+        "item_name": first_of("item_name"),
+        "item_type": first_of("item_type"),
+        "average_price_reported": first_of("average_price"),
+        "my_quantity": first_of("my_quantity"),
+    }
+    data.update(columns)
+    return pd.DataFrame(data, columns=SUMMARY_COLUMNS)
@@ -0,0 +1,191 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+import pandas as pd
+
+from .config import MAX_WORKERS, RATE_LIMIT_PER_MIN
+from .history_store import HistoryStore
+from .http_api import deepen_books, fetch_many, session_for_requests
+from .item_dictionary import DICTIONARY_REGISTRY
+from .order_book import book_is_thin
+from .market_enrichment import books_to_long, build_summary_from_enriched, enrich_all_items
+from .rate_limit import TokenBucket
+from .snapshot_cache import SnapshotCache
+
+ROOT_DIR = Path(__file__).resolve().parents[2]
+DICT_PATH = ROOT_DIR / "data" / "torn_item_dictionary.csv"
+SNAPSHOT_DB_PATH = ROOT_DIR / "data" / "market_snapshots.sqlite"
+SCAN_DIR = ROOT_DIR / "data" / "scan"
+HISTORY_DIR = ROOT_DIR / "data" / "history"
+
+SCAN_BATCH_SIZE = MAX_WORKERS * 10
+
+
+def select_items(
+    name_to_id: dict[str, int],
+    ids: Optional[Iterable[int]] = None,
+    name_contains: Optional[str] = None,
+    limit: Optional[int] = None,
+) -> List[int]:
+    wanted = set(ids) if ids else None
+    needle = name_contains.casefold() if name_contains else None
+
+    selected = sorted(
+        {
+            item_id
+            for name, item_id in name_to_id.items()
+            if (wanted is None or item_id in wanted) and (needle is None or needle in name.casefold())
+        }
+    )
+    return selected[:limit] if limit else selected
+
+
+class ScanCheckpoint:
+    def __init__(self, scan_dir: str | Path) -> None:
+        self.path = Path(scan_dir) / "scan_checkpoint.json"
+
+    def load(self) -> dict | None:
+        if not self.path.exists():
+            return None
+        with self.path.open("r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def save(self, started_at: float, item_ids: List[int]) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump({"started_at": started_at, "item_ids": item_ids}, f)
+        tmp.replace(self.path)
+
+    def clear(self) -> None:
+        self.path.unlink(missing_ok=True)
+
+
+def scan_market(
+    api_key: str,
+    item_ids: List[int],
+    store: SnapshotCache,
+    checkpoint: ScanCheckpoint,
+    resume: bool = True,
+    rate_per_min: int = RATE_LIMIT_PER_MIN,
+    max_workers: int = MAX_WORKERS,
+    batch_size: int = SCAN_BATCH_SIZE,
+    history: Optional[HistoryStore] = None,
+    log=print,
+) -> pd.DataFrame:
+    # Every fetched book goes straight into the snapshot store, so the store
+    # itself is the progress record: an item counts as done once it has a
+    # snapshot newer than the scan's start time.
+    state = checkpoint.load() if resume else None
+    if state and state.get("item_ids") == item_ids:
+        started_at = float(state["started_at"])
+        log(f"Resuming scan started {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(started_at))}")
+    else:
+        started_at = time.time()
+        checkpoint.save(started_at, item_ids)
+
+    done = store.fetched_since(started_at)
+    todo = [iid for iid in item_ids if iid not in done]
+    log(f"{len(item_ids) - len(todo)}/{len(item_ids)} items already scanned, {len(todo)} to fetch")
+
+    session = session_for_requests()
+    bucket = TokenBucket(rate_per_min)
+    errors: dict[int, str] = {}
+    t0 = time.perf_counter()
+
+    for start in range(0, len(todo), batch_size):
+        batch = todo[start : start + batch_size]
+        rows = fetch_many(
+            session,
+            bucket,
+            api_key,
+            [(iid, 0) for iid in batch],
+            max_workers=max_workers,
+            cache=store,
+            force_refresh=True,
+        )
+        rows = deepen_books(session, bucket, api_key, rows, book_is_thin, cache=store)
+        for row in rows:
+            if "error" in row:
+                errors[int(row["item_id"])] = row["error"]
+
+        fetched = start + len(batch)
+        elapsed = time.perf_counter() - t0
+        eta = elapsed / fetched * (len(todo) - fetched)
+        log(f"{fetched}/{len(todo)} fetched, {len(errors)} errors, {elapsed:.0f}s elapsed, ~{eta:.0f}s left")
+
+    if errors:
+        log(f"{len(errors)} items failed and will be retried on the next resume: {sorted(errors)[:20]}")
+    else:
+        checkpoint.clear()
+
+    # Items that failed in this scan are left out rather than priced from an
+    # older snapshot the store may still hold.
+    books = [b for b in (store.get(iid, 0) for iid in item_ids if iid not in errors) if b is not None]
+    df_long = books_to_long(books)
+    if df_long.empty:
+        return build_summary_from_enriched(df_long)
+    summary = build_summary_from_enriched(enrich_all_items(df_long))
+    if history is not None:
+        written = history.append(books, summary)
+        log(f"Recorded {written} books in the price history")
+    return summary
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Scan the Torn item market for every item in the dictionary.")
+    parser.add_argument("--api-key", default=os.environ.get("TORN_API_KEY", ""))
+    parser.add_argument("--dict", type=Path, default=DICT_PATH)
+    parser.add_argument("--store", type=Path, default=SNAPSHOT_DB_PATH)
+    parser.add_argument("--scan-dir", type=Path, default=SCAN_DIR)
+    parser.add_argument("--history-dir", type=Path, default=HISTORY_DIR)
+    parser.add_argument("--no-history", action="store_true", help="Do not append this scan to the price history.")
+    parser.add_argument("--out", type=Path, default=None)
+    parser.add_argument("--ids", default=None, help="Comma-separated item ids to scan.")
+    parser.add_argument("--name-contains", default=None)
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--rate-per-min", type=int, default=RATE_LIMIT_PER_MIN)
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS)
+    parser.add_argument("--restart", action="store_true", help="Ignore any interrupted scan and start over.")
+    args = parser.parse_args(argv)
+
+    if not args.api_key.strip():
+        parser.error("an API key is required (--api-key or TORN_API_KEY)")
+
+    ids = [int(x) for x in args.ids.split(",") if x.strip()] if args.ids else None
+    item_ids = select_items(DICTIONARY_REGISTRY.get(args.dict).name_to_id, ids, args.name_contains, args.limit)
+    if not item_ids:
+        parser.error("no dictionary items match the given filters")
+
+    def log(msg: str) -> None:
+        print(f"[scan] {msg}", file=sys.stderr, flush=True)
+
+    store = SnapshotCache(args.store, ttl_seconds=float("inf"))
+    summary = scan_market(
+        args.api_key.strip(),
+        item_ids,
+        store,
+        ScanCheckpoint(args.scan_dir),
+        resume=not args.restart,
+        rate_per_min=args.rate_per_min,
+        max_workers=args.workers,
+        history=None if args.no_history else HistoryStore(args.history_dir),
+        log=log,
+    )
+
+    out = args.out or (args.scan_dir / "market_summary.csv")
+    out.parent.mkdir(parents=True, exist_ok=True)
+    summary.to_csv(out, index=False)
+    log(f"Wrote {len(summary)} item summaries to {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+from .market_enrichment import (
+    BOOK_META_COLUMNS,
+    FAST_SELL_LISTINGS_THRESHOLD,
+    FAST_SELL_UNITS_THRESHOLD,
+    LONG_COLUMNS,
+    SUMMARY_COLUMNS,
+    _enrich_arrays,
+    _summary_arrays,
+    weighted_quantiles,
+)
+
+
+class OrderBook:
+    # One item's sell book: listings with a positive quantity, sorted by price
+    # with ties kept in listing order, plus scalar metadata. Derived statistics
+    # are computed on first access and kept in the underscore slots (slots and
+    # functools.cached_property don't mix).
+    __slots__ = (
+        "item_id",
+        "item_name",
+        "item_type",
+        "average_price",
+        "my_quantity",
+        "price",
+        "quantity",
+        "rank",
+        "_cum_quantity",
+        "_levels",
+        "_features",
+        "_summary",
+    )
+
+    def __init__(
+        self,
+        item_id: int,
+        price,
+        quantity,
+        item_name: str | None = None,
+        item_type: str | None = None,
+        average_price: float | None = None,
+        my_quantity: int | None = None,
+    ) -> None:
+        price = np.asarray(price, dtype=np.int64)
+        quantity = np.asarray(quantity, dtype=np.int64)
+        listed = np.flatnonzero(quantity > 0)
+        order = listed[np.argsort(price[listed], kind="stable")]
+
+        self.item_id = int(item_id)
+        self.item_name = item_name
+        self.item_type = item_type
+        self.average_price = average_price
+        self.my_quantity = my_quantity
+        self.price = price[order]
+        self.quantity = quantity[order]
+        self.rank = order + 1
+        self._cum_quantity: np.ndarray | None = None
+        self._levels: tuple[np.ndarray, np.ndarray] | None = None
+        self._features: dict[str, np.ndarray] | None = None
+        self._summary: dict | None = None
+
+    @classmethod
+    def from_row(cls, row: dict) -> "OrderBook":
+        return cls(
+            row["item_id"],
+            row["price"],
+            row["amount"],
+            item_name=row.get("item_name"),
+            item_type=row.get("item_type"),
+            average_price=row.get("average_price"),
+            my_quantity=row.get("my_quantity"),
+        )
+
+    def __len__(self) -> int:
+        return int(self.price.size)
+
+    def __repr__(self) -> str:
+        return f"OrderBook(item_id={self.item_id}, listings={len(self)}, units={self.total_quantity})"
+
+    @property
+    def total_quantity(self) -> int:
+        return int(self.cum_quantity[-1]) if len(self) else 0
+
+    @property
+    def cum_quantity(self) -> np.ndarray:
+        if self._cum_quantity is None:
+            self._cum_quantity = np.cumsum(self.quantity)
+        return self._cum_quantity
+
+    @property
+    def levels(self) -> tuple[np.ndarray, np.ndarray]:
+        # (distinct prices, units listed at each price).
+        if self._levels is None:
+            starts = np.flatnonzero(np.r_[True, self.price[1:] != self.price[:-1]]) if len(self) else np.empty(0, np.int64)
+            self._levels = (self.price[starts], np.add.reduceat(self.quantity, starts) if starts.size else self.quantity[:0])
+        return self._levels
+
+    def quantiles(self, qs, weighted: bool = True) -> np.ndarray:
+        return weighted_quantiles(self.price, self.quantity if weighted else None, qs)
+
+    @property
+    def features(self) -> dict[str, np.ndarray]:
+        # The enrichment feature columns (ENRICHED_FEATURE_COLUMNS), row-aligned
+        # with price/quantity.
+        if self._features is None:
+            _, self._features = _enrich_arrays(
+                np.zeros(len(self), dtype=np.int64),
+                self.price,
+                self.quantity,
+                self.rank,
+            )
+        return self._features
+
+    @property
+    def anchors(self) -> np.ndarray:
+        return self.features["is_suspected_anchor"]
+
+    @property
+    def clean(self) -> np.ndarray:
+        # Listings that survive anchor removal; a book that is all anchors
+        # keeps everything, as in the pricing rules.
+        clean = ~self.anchors
+        return clean if clean.any() else np.ones(len(self), dtype=bool)
+
+    def is_thin(
+        self,
+        min_units: float = FAST_SELL_UNITS_THRESHOLD,
+        min_listings: int = FAST_SELL_LISTINGS_THRESHOLD,
+    ) -> bool:
+        # True when the cleaned book has fewer than min_listings listings or
+        # min_units units. The fast-sell mode can't decide this: it depends on
+        # the book's total units, which a truncated page understates.
+        if not len(self):
+            return True
+        clean = self.clean
+        return int(clean.sum()) < min_listings or float(self.quantity[clean].sum()) < min_units
+
+    def summary(self) -> dict:
+        # One build_summary_from_enriched row for this book.
+        if self._summary is None:
+            meta = {
+                "item_id": self.item_id,
+                "item_name": self.item_name,
+                "item_type": self.item_type,
+                "average_price_reported": self.average_price,
+                "my_quantity": self.my_quantity,
+                "num_listings": 0,
+                "num_suspected_anchors": 0,
+            }
+            if len(self):
+                _, _, columns = _summary_arrays(
+                    np.zeros(len(self), dtype=np.int64),
+                    self.price,
+                    self.quantity,
+                    self.anchors,
+                )
+                meta.update({c: v[0].item() for c, v in columns.items()})
+            self._summary = {c: meta.get(c, np.nan) for c in SUMMARY_COLUMNS}
+        return dict(self._summary)
+
+    def to_frame(self, enriched: bool = True) -> pd.DataFrame:
+        # Long-format frame (optionally with the enrichment features), for
+        # display; pricing code should use the arrays directly.
+        n = len(self)
+        data: dict[str, object] = {c: [getattr(self, c)] * n for c in BOOK_META_COLUMNS}
+        data["listing_rank"] = self.rank
+        data["price"] = self.price
+        data["quantity"] = self.quantity
+        if enriched and n:
+            data.update(self.features)
+        return pd.DataFrame(data, columns=LONG_COLUMNS + (list(self.features) if enriched and n else []))
+
+
+def book_is_thin(
+    price: np.ndarray,
+    quantity: np.ndarray,
+    min_units: float = FAST_SELL_UNITS_THRESHOLD,
+    min_listings: int = FAST_SELL_LISTINGS_THRESHOLD,
+) -> bool:
+    return OrderBook(0, price, quantity).is_thin(min_units, min_listings)
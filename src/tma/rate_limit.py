@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from collections import deque
+
+
+class TokenBucket:
+    def __init__(self, rate_per_min: int, capacity: int | None = None) -> None:
+        self.rate_per_sec = rate_per_min / 60.0
+        self.capacity = capacity or rate_per_min
+        self.tokens = float(self.capacity)
+        self.last = time.perf_counter()
+        self.lock = threading.Lock()
+        self.cond = threading.Condition(self.lock)
+        self.waiters: deque[object] = deque()
+        self.total_takes = 0
+        self.total_wait = 0.0
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate_per_sec)
+        self.last = now
+
+    def take(self, tokens: int = 1, timeout: float | None = None) -> float:
+        # Callers queue in arrival order. Only the head of the queue looks at the
+        # bucket; it sleeps until the exact moment its tokens are refilled, and
+        # everyone behind it sleeps until the head leaves. Returns seconds waited.
+        if tokens > self.capacity:
+            raise ValueError(f"Cannot take {tokens} tokens from a bucket of capacity {self.capacity}.")
+
+        start = time.perf_counter()
+        deadline = None if timeout is None else start + timeout
+        waiter = object()
+
+        with self.cond:
+            self.waiters.append(waiter)
+            try:
+                while True:
+                    now = time.perf_counter()
+                    delay: float | None = None
+                    if self.waiters[0] is waiter:
+                        self._refill(now)
+                        if self.tokens >= tokens:
+                            self.tokens -= tokens
+                            break
+                        delay = (tokens - self.tokens) / self.rate_per_sec
+
+                    if deadline is not None:
+                        remaining = deadline - now
+                        if remaining <= 0:
+                            raise TimeoutError(f"No {tokens} token(s) available within {timeout:.3f}s.")
+                        delay = remaining if delay is None else min(delay, remaining)
+
+                    self.cond.wait(delay)
+            finally:
+                was_head = self.waiters[0] is waiter
+                self.waiters.remove(waiter)
+                if was_head:
+                    self.cond.notify_all()
+
+            waited = time.perf_counter() - start
+            self.total_takes += 1
+            self.total_wait += waited
+            return waited
+
+    def try_take(self, tokens: int = 1, timeout: float = 0.0) -> bool:
+        try:
+            self.take(tokens, timeout=timeout)
+        except TimeoutError:
+            return False
+        return True
+
+
+class AsyncTokenBucket:
+    def __init__(self, rate_per_min: int, capacity: int | None = None) -> None:
+        self.rate_per_sec = rate_per_min / 60.0
+        self.capacity = capacity or rate_per_min
+        self.tokens = float(self.capacity)
+        self.last = time.perf_counter()
+        self.lock = asyncio.Lock()
+        self.queued = 0
+        self.total_takes = 0
+        self.total_wait = 0.0
+
+    def _refill(self) -> None:
+        now = time.perf_counter()
+        self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate_per_sec)
+        self.last = now
+
+    async def _take(self, tokens: int) -> None:
+        # asyncio.Lock wakes waiters in FIFO order, so the head of the queue sleeps
+        # exactly until its tokens are available while later callers queue behind it.
+        self.queued += 1
+        try:
+            async with self.lock:
+                self._refill()
+                if self.tokens < tokens:
+                    await asyncio.sleep((tokens - self.tokens) / self.rate_per_sec)
+                    self._refill()
+                self.tokens -= tokens
+        finally:
+            self.queued -= 1
+
+    async def take(self, tokens: int = 1, timeout: float | None = None) -> float:
+        if tokens > self.capacity:
+            raise ValueError(f"Cannot take {tokens} tokens from a bucket of capacity {self.capacity}.")
+
+        start = time.perf_counter()
+        # Nobody is queued and the tokens are there: take them without yielding,
+        # which is also the only way a zero timeout can succeed.
+        ready = False
+        if self.queued == 0:
+            self._refill()
+            ready = self.tokens >= tokens
+
+        if ready:
+            self.tokens -= tokens
+        elif timeout is None:
+            await self._take(tokens)
+        elif timeout > 0:
+            try:
+                await asyncio.wait_for(self._take(tokens), timeout)
+            except asyncio.TimeoutError:
+                raise TimeoutError(f"No {tokens} token(s) available within {timeout:.3f}s.") from None
+        else:
+            raise TimeoutError(f"No {tokens} token(s) available within {timeout:.3f}s.")
+
+        waited = time.perf_counter() - start
+        self.total_takes += 1
+        self.total_wait += waited
+        return waited
+
+    async def try_take(self, tokens: int = 1, timeout: float = 0.0) -> bool:
+        try:
+            await self.take(tokens, timeout=timeout)
+        except TimeoutError:
+            return False
+        return True
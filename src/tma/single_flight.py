@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import threading
+from typing import Any, Callable, Dict, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException | None = None
+
+
+class SingleFlight:
+    def __init__(self) -> None:
+        self.calls: Dict[Hashable, _Call] = {}
+        self.lock = threading.Lock()
+        self.leaders = 0
+        self.followers = 0
+
+    def do(self, key: Hashable, fn: Callable[[], T]) -> T:
+        # The first caller for a key runs fn; callers arriving while it is in
+        # flight block on its result (or its exception) instead of repeating it.
+        with self.lock:
+            call = self.calls.get(key)
+            if call is not None:
+                self.followers += 1
+                leader = False
+            else:
+                call = _Call()
+                self.calls[key] = call
+                self.leaders += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+        return call.result
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"leaders": self.leaders, "followers": self.followers, "in_flight": len(self.calls)}
+
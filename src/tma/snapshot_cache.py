@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+from .config import SNAPSHOT_TTL_SECONDS
+from .http_api import listings_from_row, row_from_listings
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    item_id INTEGER PRIMARY KEY,
+    fetched_at REAL NOT NULL,
+    item_name TEXT,
+    item_type TEXT,
+    average_price REAL,
+    n_listings INTEGER NOT NULL,
+    listings BLOB NOT NULL
+)
+"""
+
+
+class SnapshotCache:
+    def __init__(
+        self,
+        path: str | Path,
+        ttl_seconds: float = SNAPSHOT_TTL_SECONDS,
+        ttl_overrides: Optional[Dict[int, float]] = None,
+    ) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl_seconds = float(ttl_seconds)
+        self.ttl_overrides = dict(ttl_overrides or {})
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(_SCHEMA)
+        self.conn.commit()
+
+    def ttl_for(self, item_id: int) -> float:
+        return float(self.ttl_overrides.get(int(item_id), self.ttl_seconds))
+
+    def get(self, item_id: int, my_quantity: int, force_refresh: bool = False) -> dict | None:
+        with self.lock:
+            if force_refresh:
+                self.misses += 1
+                return None
+
+            rec = self.conn.execute(
+                "SELECT fetched_at, item_name, item_type, average_price, n_listings, listings "
+                "FROM snapshots WHERE item_id = ?",
+                (int(item_id),),
+            ).fetchone()
+
+            if rec is None or time.time() - rec[0] > self.ttl_for(item_id):
+                self.misses += 1
+                return None
+            self.hits += 1
+
+        fetched_at, item_name, item_type, average_price, n, blob = rec
+        pairs = np.frombuffer(blob, dtype="<i8").reshape(2, n)
+        return row_from_listings(
+            item_id,
+            item_name,
+            item_type,
+            average_price,
+            my_quantity,
+            pairs,
+            fetched_at=fetched_at,
+            expires_at=fetched_at + self.ttl_for(item_id),
+        )
+
+    def put(self, row: dict) -> None:
+        if "error" in row:
+            return
+        pairs = listings_from_row(row)
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO snapshots "
+                "(item_id, fetched_at, item_name, item_type, average_price, n_listings, listings) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    int(row["item_id"]),
+                    row.get("fetched_at") or time.time(),
+                    row.get("item_name"),
+                    row.get("item_type"),
+                    row.get("average_price"),
+                    pairs.shape[1],
+                    pairs.astype("<i8").tobytes(),
+                ),
+            )
+            self.conn.commit()
+
+    def fetch(
+        self,
+        item_id: int,
+        my_quantity: int,
+        fetch_fn: Callable[[], dict],
+        force_refresh: bool = False,
+    ) -> dict:
+        cached = self.get(item_id, my_quantity, force_refresh=force_refresh)
+        if cached is not None:
+            return cached
+
+        row = fetch_fn()
+        self.put(row)
+        return row
+
+    def fetched_since(self, since: float) -> set[int]:
+        with self.lock:
+            rows = self.conn.execute("SELECT item_id FROM snapshots WHERE fetched_at >= ?", (since,)).fetchall()
+        return {int(r[0]) for r in rows}
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+    def close(self) -> None:
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,60 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+SRC_DIR = ROOT_DIR / "src"
+if str(SRC_DIR) not in sys.path:
+    sys.path.insert(0, str(SRC_DIR))
+
+from tma.history_store import HistoryStore
+from tma.market_enrichment import books_to_long, build_summary_from_enriched, enrich_all_items
+
+
+def make_book(item_id: int, prices) -> dict:
+    return {
+        "item_id": item_id,
+        "item_name": f"Item {item_id}",
+        "item_type": "Misc",
+        "average_price": 1000.0,
+        "my_quantity": None,
+        "price": np.asarray(prices, dtype=np.int64),
+        "amount": np.ones(len(prices), dtype=np.int64),
+    }
+
+
+def test_append_round_trip_with_default_fetched_at(tmp_path):
+    books = [make_book(1, [100, 110, 120]), make_book(250, [5000, 5100])]
+    summary = build_summary_from_enriched(enrich_all_items(books_to_long(books)))
+    store = HistoryStore(tmp_path)
+
+    assert store.append(books, summary) == 2
+    assert store.append(books, summary) == 0
+
+    stored = store.read_books()
+    assert stored["item_id"].tolist() == [1, 1, 1, 250, 250]
+    assert stored["rank"].tolist() == [1, 2, 3, 1, 2]
+    assert stored["price"].tolist() == [100, 110, 120, 5000, 5100]
+    assert stored["fetched_at"].nunique() == 1
+
+    rows = store.read_summary(item_ids=[250])
+    assert rows["item_id"].tolist() == [250]
+    assert rows["fair_price"].tolist() == summary.loc[summary["item_id"] == 250, "fair_price"].tolist()
+    assert (rows["fetched_at"] == stored["fetched_at"].iloc[0]).all()
+    assert pd.api.types.is_datetime64_any_dtype(rows["fetched_at"])
+
+
+def test_books_keep_their_own_fetched_at_across_restarts(tmp_path):
+    book = make_book(7, [300, 310])
+    book["fetched_at"] = 1_790_000_000.1234
+    summary = build_summary_from_enriched(enrich_all_items(books_to_long([book])))
+
+    assert HistoryStore(tmp_path).append([book], summary) == 1
+    assert HistoryStore(tmp_path).append([book], summary) == 0
+
+    stored = HistoryStore(tmp_path).read_books()
+    assert len(stored) == 2
+    assert (stored["fetched_at"] == pd.Timestamp(1_790_000_000_123, unit="ms", tz="UTC")).all()
+    assert len(HistoryStore(tmp_path).read_summary()) == 1
@@ -0,0 +1,48 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+SRC_DIR = ROOT_DIR / "src"
+if str(SRC_DIR) not in sys.path:
+    sys.path.insert(0, str(SRC_DIR))
+
+from tma.incremental import IncrementalPricer
+from tma.market_enrichment import books_to_long, enrich_all_items
+
+
+def make_book(item_id: int, prices, average_price=1000.0) -> dict:
+    return {
+        "item_id": item_id,
+        "item_name": f"Item {item_id}",
+        "item_type": "Misc",
+        "average_price": average_price,
+        "my_quantity": 1,
+        "price": np.asarray(prices, dtype=np.int64),
+        "amount": np.ones(len(prices), dtype=np.int64),
+    }
+
+
+def test_books_without_listings_give_empty_frames():
+    pricer = IncrementalPricer()
+    enriched, summary = pricer.price([make_book(1, [])])
+    assert enriched.empty and summary.empty
+
+    pricer.price([make_book(1, [100, 110])])
+    enriched, summary = pricer.price([make_book(1, [])])
+    assert enriched.empty and summary.empty
+
+
+def test_reused_entries_keep_their_own_dtypes():
+    pricer = IncrementalPricer()
+    a = make_book(1, [100, 110, 120], average_price=None)
+    pricer.price([a, make_book(2, [5000, 5100], average_price=5000)])
+
+    b = make_book(2, [5000, 5200], average_price=5000)
+    enriched, _ = pricer.price([a, b])
+
+    expected = enrich_all_items(books_to_long([a, b]))
+    pd.testing.assert_frame_equal(enriched, expected.reset_index(drop=True))
+    assert enriched["average_price"].isna().sum() == 3